@@ -0,0 +1,57 @@
+"""
+Compares Entry.from_row with the caching RowParser on synthetic rows.
+
+    python benchmarks/bench_parse.py [rows]
+"""
+
+import datetime
+import random
+import sys
+import timeit
+
+from accfifo.entry import Entry, RowParser
+
+
+def synthetic_rows(count, seed=0, date_format='%d-%b-%Y'):
+    """
+    Generates .csv-like rows spread over a few years of trading days.
+    """
+    rng = random.Random(seed)
+    start = datetime.datetime(2015, 1, 1)
+    return [
+        {
+            'Tx': str(i),
+            'Qty': str(rng.choice([-1, 1]) * rng.randint(1, 500)),
+            'Cost': f'{rng.randint(1000, 20000) / 100:.2f}',
+            'Date': (start + datetime.timedelta(days=i * 2000 // count)).strftime(date_format),
+        }
+        for i in range(count)
+    ]
+
+
+def bench(rows, repeat=3):
+    """
+    Returns the best rows per second of both parsers.
+    """
+    def from_row():
+        for row in rows:
+            Entry.from_row(row)
+
+    def row_parser():
+        parser = RowParser()
+        for row in rows:
+            parser.entry(row)
+
+    return {
+        name: len(rows) / min(timeit.repeat(func, number=1, repeat=repeat))
+        for name, func in (('Entry.from_row', from_row), ('RowParser', row_parser))
+    }
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for date_format in ('%d-%b-%y', '%d-%b-%Y'):
+        results = bench(synthetic_rows(count, date_format=date_format))
+        baseline = results['Entry.from_row']
+        for name, rate in results.items():
+            print(f'{date_format:10} {name:16} {rate:12,.0f} rows/s  x{rate / baseline:.1f}')
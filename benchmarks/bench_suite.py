@@ -0,0 +1,143 @@
+"""
+Benchmarks FIFO computation, ingestion and reporting.
+
+    python benchmarks/bench_suite.py [--size N] [--save] [--baseline FILE] [--tolerance X]
+
+Every case reports its best time out of a few runs, its throughput and
+its peak traced memory, and is compared with the stored baseline. The
+process exits with 1 if a case is slower than the baseline by more than
+the tolerance. Baselines are machine-specific: re-save them with --save
+on the machine which runs the comparison.
+
+Some cases are also compared with their counterparts in the same run,
+which holds on any machine: the running aggregates of the 'money'
+numeric mode, for one, must keep up with those of the 'minor' mode.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from click.testing import CliRunner
+
+from accfifo import FIFO
+from accfifo.cli import cli
+from accfifo.read_csv import read_csv
+
+from generators import GENERATORS, churn, make_entries, reversals, write_csv
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Pairs of cases of which the first must be no slower than the second,
+# within the tolerance:
+COUNTERPARTS = (
+    ('compute/churn', 'compute/churn/minor'),
+    ('compute/reversals', 'compute/reversals/minor'),
+)
+
+
+def cases(size, csv_filename):
+    """
+    Yields (name, items, setup, run) for every benchmark case. The setup
+    is called before each run and its result given to the run, so that
+    only the run is measured.
+    """
+    for name, generator in GENERATORS.items():
+        trades = generator(size)
+        yield f'compute/{name}', size, (lambda trades=trades: make_entries(trades)), FIFO
+
+    trades = churn(size)
+    yield 'compute/churn/minor', size, (lambda: make_entries(trades)), (lambda e: FIFO(e, numeric='minor'))
+
+    trades = reversals(size)
+    yield 'compute/reversals/minor', size, (lambda: make_entries(trades)), (lambda e: FIFO(e, numeric='minor'))
+    yield 'compute/reversals/numpy', size, (lambda: make_entries(trades)), (lambda e: FIFO(e, engine='numpy'))
+
+    write_csv(churn(size), csv_filename)
+    yield 'read_csv', size, (lambda: None), (lambda _: read_csv(None, csv_filename))
+
+    fifo = FIFO(make_entries(churn(size)))
+    yield 'group_as_tax_rows', len(fifo.trace), (lambda: fifo), (lambda f: list(f._group_as_tax_rows()))
+
+    for output in ('plain', 'rich'):
+        # Rich tables are much slower to render, keep them smaller:
+        rows = size if output == 'plain' else max(1, size // 20)
+        filename = f'{csv_filename}.{output}.csv'
+        write_csv(churn(rows), filename)
+        args = ['-f', filename, '--format', output]
+        yield f'cli/{output}', rows, (lambda: None), (lambda _, args=args: CliRunner().invoke(cli, args))
+
+
+def measure(items, setup, run, repeat):
+    """
+    Returns the best time, the throughput and the peak memory of the case.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        argument = setup()
+        started = time.perf_counter()
+        run(argument)
+        best = min(best, time.perf_counter() - started)
+
+    argument = setup()
+    tracemalloc.start()
+    run(argument)
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': best, 'rate': items / best, 'peak_kib': peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=20_000, help='number of entries per case')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs per case')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file to compare with')
+    parser.add_argument('--save', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='allowed slowdown against the baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get('size') != args.size:
+            print(f'Baseline was taken with --size {baseline.get("size")}, not comparing')
+            baseline = {}
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, items, setup, run in cases(args.size, os.path.join(directory, 'trades.csv')):
+            result = results[name] = measure(items, setup, run, args.repeat)
+            line = f'{name:28} {result["seconds"]:8.3f} s {result["rate"]:12,.0f} /s {result["peak_kib"]:10,.0f} KiB'
+            previous = baseline.get('results', {}).get(name)
+            if previous is not None:
+                ratio = result['seconds'] / previous['seconds']
+                line += f'  x{ratio:.2f} vs baseline'
+                if ratio > args.tolerance:
+                    regressions.append(name)
+                    line += '  SLOWER'
+            print(line)
+
+    for name, counterpart in COUNTERPARTS:
+        ratio = results[name]['seconds'] / results[counterpart]['seconds']
+        if ratio > args.tolerance:
+            regressions.append(name)
+            print(f'{name} is x{ratio:.2f} slower than {counterpart}')
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump({'size': args.size, 'results': results}, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print(f'Saved baseline to {args.baseline}')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
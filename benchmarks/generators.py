@@ -0,0 +1,81 @@
+"""
+Synthetic trade generators for the benchmarks.
+
+Every generator returns (quantity, price) pairs, which `make_entries`
+turns into dated entries one day apart.
+"""
+
+import datetime
+import random
+
+from moneyed import Money
+
+from accfifo import Entry
+
+
+def buy_only(count, seed=0):
+    """
+    A long history of buys which only grows the inventory.
+    """
+    rng = random.Random(seed)
+    return [(rng.randint(1, 100), rng.randint(10, 200)) for _ in range(count)]
+
+
+def churn(count, seed=0):
+    """
+    Alternating buys and sells of random sizes around a flat position.
+    """
+    rng = random.Random(seed)
+    trades = []
+    for i in range(count):
+        quantity = rng.randint(1, 100)
+        trades.append((quantity if i % 2 == 0 else -quantity, rng.randint(10, 200)))
+    return trades
+
+
+def reversals(count, seed=0):
+    """
+    Every entry flips the position from long to short or back, going
+    through the fill and reverse cycle of the engine.
+    """
+    rng = random.Random(seed)
+    return [((200 if i % 2 == 0 else -200) if i else 100, rng.randint(10, 200)) for i in range(count)]
+
+
+def partial_fills(count, seed=0, lot=1000):
+    """
+    Big lots relieved by many tiny sells, each munching a part of a lot.
+    """
+    rng = random.Random(seed)
+    return [(lot if i % (lot + 1) == 0 else -1, rng.randint(10, 200)) for i in range(count)]
+
+
+GENERATORS = {
+    'buy_only': buy_only,
+    'churn': churn,
+    'reversals': reversals,
+    'partial_fills': partial_fills,
+}
+
+
+def make_entries(trades):
+    """
+    Builds dated, priced entries out of (quantity, price) pairs.
+    """
+    start = datetime.datetime(2000, 1, 1)
+    return [
+        Entry(str(i), quantity, Money(price, 'USD'), start + datetime.timedelta(days=i))
+        for i, (quantity, price) in enumerate(trades)
+    ]
+
+
+def write_csv(trades, filename):
+    """
+    Writes (quantity, price) pairs to a .csv as read by `read_csv`.
+    """
+    start = datetime.datetime(2000, 1, 1)
+    with open(filename, 'w') as csvfile:
+        csvfile.write('Tx,Qty,Cost,Date\n')
+        for i, (quantity, price) in enumerate(trades):
+            date = (start + datetime.timedelta(days=i)).strftime('%d-%b-%Y')
+            csvfile.write(f'{i},{quantity},{price},{date}\n')
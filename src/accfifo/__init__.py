@@ -33,3 +33,6 @@ Computes the FIFO accounting valuation and stock inventory.
 
 from accfifo import entry, fifo
 
+from accfifo.book import Book
+from accfifo.entry import Entry
+from accfifo.fifo import FIFO
@@ -0,0 +1,138 @@
+"""
+Feeds entries from asynchronous producers into a FIFO accounting.
+"""
+
+import asyncio
+from typing import AsyncIterator, NamedTuple
+
+from accfifo.entry import Entry
+from accfifo.fifo import FIFO
+from accfifo.munch import Munch
+
+# Marks the end of the entries and of the updates:
+_DONE = None
+
+
+class Update(NamedTuple):
+    """
+    What a batch of entries changed: the munches they produced, and the
+    stock and valuation after them.
+    """
+    entries: int
+    munches: list[Munch]
+    stock: int
+    valuation: object
+
+
+class Ingest(object):
+    """
+    Applies entries put by any number of asynchronous producers to a
+    FIFO accounting, in the order they are put.
+
+    Entries wait in a queue of at most `maxsize` entries, so producers
+    are held back by `put` while the engine is behind. The engine takes
+    whatever is queued at once, as a batch, and publishes an `Update`
+    per batch to `updates` if asked to. Updates wait in a queue of the
+    same size, so they must be consumed, or the engine is held back in
+    turn. Once failed or cancelled, the engine no longer waits for them:
+    updates not consumed yet are dropped, and `updates` ends.
+
+        async with Ingest(fifo, updates=True) as ingest:
+            ...  # producers await ingest.put(entry)
+            ...  # a reporter iterates over ingest.updates()
+
+    Leaving the block waits until all entries put are applied.
+    """
+
+    def __init__(self, fifo: FIFO | None = None, maxsize=1024, updates=False, **options):
+        self.fifo = fifo if fifo is not None else FIFO(**options)
+        self._maxsize = maxsize
+        self._entries: asyncio.Queue = asyncio.Queue(maxsize)
+        self._updates: asyncio.Queue | None = asyncio.Queue(maxsize) if updates else None
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self._task.cancel()
+        await self.close()
+
+    def start(self):
+        """
+        Starts applying entries, in a task of the running event loop.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, entry: Entry):
+        """
+        Queues an entry, waiting while the queue is full.
+        """
+        if self._error is not None:
+            raise RuntimeError('Ingestion failed') from self._error
+        await self._entries.put(entry)
+
+    async def close(self):
+        """
+        Marks the end of the entries and waits until all are applied.
+        """
+        if not self._task.done():
+            await self._entries.put(_DONE)
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def updates(self) -> AsyncIterator[Update]:
+        """
+        Yields the updates as batches of entries are applied, until the
+        ingestion is closed.
+        """
+        if self._updates is None:
+            raise ValueError('Updates are not published, see Ingest(updates=True)')
+        while (update := await self._updates.get()) is not _DONE:
+            yield update
+
+    async def _run(self):
+        try:
+            done = False
+            while not done:
+                # Take what is queued, waiting for one entry at least:
+                batch = []
+                entry = await self._entries.get()
+                while entry is not _DONE:
+                    batch.append(entry)
+                    if len(batch) == self._maxsize or self._entries.empty():
+                        break
+                    entry = self._entries.get_nowait()
+                else:
+                    done = True
+                if batch:
+                    update = self._apply(batch)
+                    if self._updates is not None:
+                        await self._updates.put(update)
+            if self._updates is not None:
+                await self._updates.put(_DONE)
+        except BaseException as e:
+            # Fail the following puts, and release the waiting ones:
+            self._error = e
+            while not self._entries.empty():
+                self._entries.get_nowait()
+            # Nor wait for the updates to be consumed, which they may
+            # never be once failed or cancelled. Those not taken yet are
+            # dropped to make room for the end:
+            if self._updates is not None:
+                while not self._updates.empty():
+                    self._updates.get_nowait()
+                self._updates.put_nowait(_DONE)
+            raise
+
+    def _apply(self, batch: list[Entry]) -> Update:
+        trace = self.fifo.trace
+        start = len(trace)
+        self.fifo.extend(batch)
+        munches = [trace[i] for i in range(start, len(trace))]
+        return Update(len(batch), munches, self.fifo.stock, self.fifo.valuation)
@@ -0,0 +1,192 @@
+"""
+Reads entries from, and writes the trace and tax rows to, Arrow and
+Parquet files.
+
+Columns are converted a batch at a time, without formatting or parsing
+any text. Prices are stored as decimal128 with the currency in the
+schema metadata.
+
+This module requires PyArrow, which is an optional dependency.
+"""
+
+import time
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+import moneyed
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from accfifo.entry import Entry
+from accfifo.fifo import FIFO
+from accfifo.munch import Munch
+from accfifo.stats import Stats
+from accfifo.tax_row import TaxRow
+
+# The columns entries are read from, as in a .csv:
+COLUMNS = ('Tx', 'Qty', 'Cost', 'Date')
+
+BATCH_SIZE = 65536
+
+# Decimal places of the prices written, as many as minor units have:
+SCALE = 6
+
+
+def _price_type(scale: int) -> pa.DataType:
+    return pa.decimal128(38, scale)
+
+
+def _currency(schema: pa.Schema, currency: str) -> str:
+    metadata = schema.metadata or {}
+    return metadata.get(b'currency', currency.encode()).decode()
+
+
+def iter_batches(batches: Iterable[pa.RecordBatch], columns=(), currency='USD',
+                 stats: Stats | None = None) -> Iterator[Entry]:
+    """Lazily yield entries from record batches, keeping extra columns as entry data"""
+    costs: dict = {}
+    for batch in batches:
+        started = time.perf_counter()
+        currency = _currency(batch.schema, currency)
+        txs = batch.column('Tx').cast(pa.string()).to_pylist()
+        quantities = batch.column('Qty').cast(pa.int64()).to_pylist()
+        dates = batch.column('Date').cast(pa.timestamp('us')).to_pylist()
+        amounts = batch.column('Cost').to_pylist()
+        data = [batch.column(name).to_pylist() for name in columns]
+
+        # Each distinct cost makes one Money only:
+        prices = []
+        for amount in amounts:
+            price = costs.get(amount)
+            if price is None:
+                price = costs[amount] = moneyed.Money(
+                    Decimal(repr(amount)) if isinstance(amount, float) else amount, currency)
+            prices.append(price)
+
+        if columns:
+            extra = [dict(zip(columns, values)) for values in zip(*data)]
+            entries = [Entry(*fields, **more) for (*fields, more) in zip(txs, quantities, prices, dates, extra)]
+        else:
+            entries = [Entry(*fields) for fields in zip(txs, quantities, prices, dates)]
+        if stats is not None:
+            stats.parsing += time.perf_counter() - started
+        yield from entries
+
+
+def iter_parquet(filename, columns=(), currency='USD', stats: Stats | None = None) -> Iterator[Entry]:
+    """Lazily yield entries from a Parquet file, a batch of rows at a time"""
+    parquet = pq.ParquetFile(filename)
+    batches = parquet.iter_batches(batch_size=BATCH_SIZE, columns=list(COLUMNS) + list(columns))
+    currency = _currency(parquet.schema_arrow, currency)
+    yield from iter_batches(batches, columns, currency, stats)
+
+
+def iter_arrow(filename, columns=(), currency='USD', stats: Stats | None = None) -> Iterator[Entry]:
+    """Lazily yield entries from an Arrow IPC file, memory-mapped so that columns are not copied"""
+    with pa.memory_map(str(filename)) as source:
+        reader = pa.ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        yield from iter_batches(batches, columns, _currency(reader.schema, currency), stats)
+
+
+def read_parquet(filename, stats: Stats | None = None, **options) -> FIFO:
+    # Entries are streamed straight into the engine, as with read_csv:
+    return FIFO(iter_parquet(filename, stats=stats), stats=stats, **options)
+
+
+def read_arrow(filename, stats: Stats | None = None, **options) -> FIFO:
+    return FIFO(iter_arrow(filename, stats=stats), stats=stats, **options)
+
+
+def _side_fields(side: str, price_type: pa.DataType) -> list[pa.Field]:
+    return [
+        pa.field(f'{side}_tx', pa.string()),
+        pa.field(f'{side}_qty', pa.int64()),
+        pa.field(f'{side}_price', price_type),
+        pa.field(f'{side}_date', pa.timestamp('us')),
+        pa.field(f'{side}_factor', pa.float64()),
+    ]
+
+
+def trace_schema(currency='USD', scale=SCALE) -> pa.Schema:
+    """The schema of an exported trace: both sides of each munch, and whether it is short-term"""
+    fields = _side_fields('in', _price_type(scale)) + _side_fields('out', _price_type(scale))
+    return pa.schema(fields + [pa.field('st', pa.bool_())], metadata={'currency': currency})
+
+
+def tax_rows_schema(currency='USD', scale=SCALE) -> pa.Schema:
+    """The schema of exported tax rows"""
+    return pa.schema([
+        pa.field('tx', pa.string()),
+        pa.field('st', pa.bool_()),
+        pa.field('qty', pa.int64()),
+        pa.field('proceeds', _price_type(scale)),
+        pa.field('cb', _price_type(scale)),
+        pa.field('lots', pa.int64()),
+    ], metadata={'currency': currency})
+
+
+def _trace_batch(munches: list[Munch], schema: pa.Schema) -> pa.RecordBatch:
+    columns = []
+    for side in (0, 1):
+        entries = [m[side] for m in munches]
+        columns.append([e.tx for e in entries])
+        columns.append([e.quantity for e in entries])
+        columns.append([e.price.amount for e in entries])
+        columns.append([e.date for e in entries])
+        columns.append([e.factor for e in entries])
+    columns.append([m.st() for m in munches])
+    return pa.RecordBatch.from_arrays([pa.array(c, f.type) for (c, f) in zip(columns, schema)], schema=schema)
+
+
+def _tax_rows_batch(rows: list[TaxRow], schema: pa.Schema) -> pa.RecordBatch:
+    columns = [
+        [r.tx for r in rows],
+        [r.st for r in rows],
+        [r.qty() for r in rows],
+        [r.proceeds().amount for r in rows],
+        [r.cb().amount for r in rows],
+        [len(r.lots) for r in rows],
+    ]
+    return pa.RecordBatch.from_arrays([pa.array(c, f.type) for (c, f) in zip(columns, schema)], schema=schema)
+
+
+def _writer(filename, schema: pa.Schema, format: str):
+    if format == 'parquet':
+        return pq.ParquetWriter(filename, schema)
+    if format == 'arrow':
+        return pa.ipc.new_file(filename, schema)
+    raise ValueError(f'Unknown format {format!r}, expected parquet or arrow')
+
+
+def _write(items: Iterable, filename, schema: pa.Schema, make_batch, format: str) -> int:
+    # Convert and write a batch at a time, so that items may be streamed:
+    count = 0
+    with _writer(filename, schema, format) as writer:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == BATCH_SIZE:
+                writer.write_batch(make_batch(batch, schema))
+                count += len(batch)
+                batch = []
+        if batch or count == 0:
+            writer.write_batch(make_batch(batch, schema))
+            count += len(batch)
+    return count
+
+
+def write_trace(munches: Iterable[Munch], filename, format='parquet', currency='USD', scale=SCALE) -> int:
+    """
+    Writes munches, such as a FIFO trace or stream, to a Parquet or
+    Arrow IPC file. Returns the number of munches written.
+    """
+    return _write(munches, filename, trace_schema(currency, scale), _trace_batch, format)
+
+
+def write_tax_rows(rows: Iterable[TaxRow], filename, format='parquet', currency='USD', scale=SCALE) -> int:
+    """
+    Writes tax rows to a Parquet or Arrow IPC file. Returns the number
+    of tax rows written.
+    """
+    return _write(rows, filename, tax_rows_schema(currency, scale), _tax_rows_batch, format)
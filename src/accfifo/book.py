@@ -0,0 +1,90 @@
+"""
+Keeps independent FIFO accountings per instrument or account.
+"""
+
+from typing import Callable, Hashable, Iterable, Iterator
+
+from typing_extensions import Generator
+
+from accfifo.entry import Entry
+from accfifo.fifo import FIFO
+from accfifo.tax_row import TaxRow
+
+
+class Book(object):
+    """
+    Routes entries into one FIFO accounting per key, such as a symbol
+    or an account.
+
+    The key is either the name of an item of `Entry.data` or a callable
+    taking the entry. FIFO accountings are created as their keys show
+    up, with the given options (see `FIFO`).
+    """
+
+    def __init__(self, key: str | Callable[[Entry], Hashable], entries: Iterable[Entry] = None, **options):
+        self._key = key if callable(key) else (lambda entry: entry.data[key])
+        self._options = options
+        self.fifos: dict[Hashable, FIFO] = {}
+        if entries is not None:
+            self.extend(entries)
+
+    def __len__(self):
+        return len(self.fifos)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.fifos)
+
+    def __getitem__(self, key: Hashable) -> FIFO:
+        return self.fifos[key]
+
+    def items(self):
+        return self.fifos.items()
+
+    def key_of(self, entry: Entry) -> Hashable:
+        """
+        Returns the key the entry is routed by.
+        """
+        return self._key(entry)
+
+    def add(self, entry: Entry):
+        """
+        Routes the entry to the FIFO accounting of its key.
+        """
+        key = self._key(entry)
+        fifo = self.fifos.get(key)
+        if fifo is None:
+            fifo = self.fifos[key] = FIFO(**self._options)
+        fifo.add(entry)
+
+    def extend(self, entries: Iterable[Entry]):
+        """
+        Routes the entries to the FIFO accountings of their keys.
+        """
+        for entry in entries:
+            self.add(entry)
+
+    @property
+    def stock(self):
+        """
+        Returns the available stock across all keys.
+        """
+        return sum(fifo.stock for fifo in self.fifos.values())
+
+    @property
+    def valuation(self):
+        """
+        Returns the inventory valuation across all keys.
+        """
+        return sum(fifo.valuation for fifo in self.fifos.values())
+
+    @property
+    def profit_and_loss(self):
+        """
+        Returns the realized profit and loss across all keys.
+        """
+        return sum(fifo.profit_and_loss for fifo in self.fifos.values())
+
+    def group_as_tax_rows(self) -> Generator[TaxRow]:
+        """Group munches into tax rows, key by key"""
+        for fifo in self.fifos.values():
+            yield from fifo.group_as_tax_rows()
@@ -0,0 +1,125 @@
+"""
+Saves and restores the state of a FIFO accounting.
+
+A checkpoint holds the open inventory, the balance and the running
+aggregates, and optionally the closed trace. It is a versioned header
+followed by a compressed JSON document whose layout the version
+governs:
+
+    {"inventory": [entry, ...], "balance": number,
+     "aggregates": [value, value, value, value], "date": date,
+     "trace": [[entry, entry], ...] or null}
+
+An entry is `[tx, quantity, price, date, factor, data]`, where money is
+`[amount, currency]`, a date is in ISO format or null, and Decimals are
+strings, so that they are kept exactly. Entry data must be JSON values.
+Loading builds plain entries and never runs any code from the file.
+"""
+
+import datetime
+import json
+import struct
+import zlib
+from decimal import Decimal
+
+import moneyed
+
+from accfifo.entry import Entry
+from accfifo.fifo import FIFO
+from accfifo.lot import expand
+from accfifo.munch import Munch
+
+MAGIC = b'ACCFIFO\0'
+VERSION = 2
+
+_HEADER = struct.Struct('>8sH')
+
+
+def _encode_number(value):
+    # JSON keeps ints and floats as they are, but not Decimals:
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def _decode_number(value):
+    return Decimal(value) if isinstance(value, str) else value
+
+
+def _encode_value(value):
+    if isinstance(value, moneyed.Money):
+        return [str(value.amount), value.currency.code]
+    return _encode_number(value)
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        (amount, currency) = value
+        return moneyed.Money(Decimal(amount), currency)
+    return _decode_number(value)
+
+
+def _encode_date(date: datetime.datetime | None):
+    return None if date is None else date.isoformat()
+
+
+def _decode_date(date: str | None) -> datetime.datetime | None:
+    return None if date is None else datetime.datetime.fromisoformat(date)
+
+
+def _encode_entry(entry: Entry) -> list:
+    return [
+        entry.tx,
+        _encode_number(entry.quantity),
+        _encode_value(entry.price),
+        _encode_date(entry.date),
+        _encode_number(entry.factor),
+        entry.data,
+    ]
+
+
+def _decode_entry(fields: list) -> Entry:
+    (tx, quantity, price, date, factor, data) = fields
+    return Entry(tx, _decode_number(quantity), _decode_value(price), _decode_date(date), _decode_number(factor), **data)
+
+
+def save_checkpoint(fifo: FIFO, filename, include_trace=False):
+    """
+    Saves the state of the FIFO accounting to a checkpoint file.
+    """
+    state = {
+        'inventory': [_encode_entry(e) for e in expand(fifo.inventory)],
+        'balance': _encode_number(fifo.stock),
+        'aggregates': [_encode_value(value) for value in fifo.aggregates],
+        'date': _encode_date(fifo.date),
+        'trace': [[_encode_entry(_in), _encode_entry(_out)] for (_in, _out) in fifo.trace] if include_trace else None,
+    }
+    with open(filename, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION))
+        file.write(zlib.compress(json.dumps(state, separators=(',', ':')).encode()))
+
+
+def load_checkpoint(filename, **options) -> FIFO:
+    """
+    Builds a FIFO accounting out of a checkpoint file, to be continued
+    with new entries (see `FIFO.extend`).
+
+    Note that the consistency check of the running aggregates needs the
+    trace, so it is not available for checkpoints saved without it. In
+    the `history` mode, the history starts with the saved state.
+    """
+    with open(filename, 'rb') as file:
+        (magic, version) = _HEADER.unpack(file.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f'{filename} is not a FIFO checkpoint')
+        if version != VERSION:
+            raise ValueError(f'Unsupported FIFO checkpoint version {version}, expected {VERSION}')
+        state = json.loads(zlib.decompress(file.read()))
+
+    trace = state['trace'] or ()
+    return FIFO.from_state(
+        map(_decode_entry, state['inventory']),
+        _decode_number(state['balance']),
+        [Munch((_decode_entry(_in), _decode_entry(_out))) for (_in, _out) in trace],
+        tuple(_decode_value(value) for value in state['aggregates']),
+        _decode_date(state['date']),
+        **options,
+    )
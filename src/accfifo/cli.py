@@ -1,8 +1,9 @@
 import logging
 import os
+import sys
+from typing import Iterable
 
 import cloup
-from moneyed import format_money
 
 from rich.console import Console
 from rich.logging import RichHandler
@@ -10,47 +11,105 @@ from rich.table import Table
 
 from accfifo.entry import format_st
 from accfifo.fifo import FIFO
+from accfifo.l10n import format_money
 from accfifo.munch import Munch
-from accfifo.read_csv import read_csv
+from accfifo.parallel import compute_parallel
+from accfifo.read_csv import iter_csv, iter_csv_parallel, read_book, read_csv
+from accfifo.stats import Stats
 from accfifo.tax_row import TaxRow, trace_table
+from accfifo.writer import RECORD_FORMATS, PlainWriter, RecordWriter, write_plain
+
+FORMATS = ('plain', 'rich') + RECORD_FORMATS
 
 
 @cloup.command()
 @cloup.option('-f', '--filename', type=str, default='../../yy.csv', help='Read data from a .csv')
-@cloup.option('--format', type=str, default='', help='Tabulate output. rich|plain')
+@cloup.option('--format', type=cloup.Choice(FORMATS), default='plain',
+              help='Tabulate output as rich or plain text, or write munch records as csv, tsv or jsonl')
+@cloup.option('-k', '--key', type=str, default=None, help='Keep one FIFO per value of this column, e.g. Symbol')
+@cloup.option('-j', '--jobs', type=int, default=1,
+              help='Parse the .csv, and compute the FIFOs of different keys, on N processes')
+@cloup.option('--profile', is_flag=True, default=False, help='Print engine counters and timings to stderr')
+@cloup.option('--stream', is_flag=True, default=False,
+              help='Print munches and tax rows as they are computed, in constant memory')
 @cloup.version_option('0.2')
-def cli(filename: str, format: str):
+def cli(filename: str, format: str, key: str | None, jobs: int, profile: bool, stream: bool):
     FORMAT = "%(message)s"
-    logging.basicConfig(level="NOTSET", format=FORMAT, datefmt="[%X]", handlers=[RichHandler()])
+    # Log to stderr, so that records written to stdout stay clean:
+    handler = RichHandler(console=Console(stderr=True))
+    logging.basicConfig(level="NOTSET", format=FORMAT, datefmt="[%X]", handlers=[handler])
     log = logging.getLogger("rich")
-    fifo = read_csv(log, filename)
-    if format == 'rich':
-        console = Console()
-        print('All transactions')
-        console.print(trace_table(fifo.trace))
-        print('All transactions grouped by type (ST/LT)')
-        console.print(tax_table(fifo))
-        for tax_row in fifo.group_as_tax_rows():
-            print(f'Out tx #{tax_row.tx}, {tax_row.qty()} shares, {"ST" if tax_row.st else "LT"}, proceeds {tax_row.proceeds()}, cost basis {tax_row.cb()}')
-            console.print(tax_row)
-            print('\n')
+    stats = Stats() if profile else None
+    if stream:
+        if key is not None or format == 'rich':
+            raise cloup.BadParameter('streaming supports plain and record output without a --key only',
+                                     param_hint='--stream')
+        fifo = FIFO(stats=stats)
+        entries = iter_csv(log, filename, stats=stats)
+        if format in RECORD_FORMATS:
+            with RecordWriter(sys.stdout, format) as writer:
+                writer.write(fifo.stream(entries))
+        else:
+            print_stream(fifo, entries)
+        fifos = {}
+    elif key is None:
+        fifos = {None: read_csv(log, filename, stats=stats, jobs=jobs)}
+    elif jobs > 1:
+        entries = iter_csv_parallel(log, filename, jobs, columns=(key,), stats=stats)
+        fifos = compute_parallel(entries, key, jobs, stats=stats).fifos
     else:
-        print("Available Stock          : ", fifo.stock)
-        print("Stock Valuation          : ", fifo.valuation)
-        print("Factored Average Cost    : ", fifo.avgcost)
-        print("Factored Stock Valuation : ", fifo.valuation_factored)
-        print("Average Cost             : ", fifo.avgcost_factored)
-        print("Trace Length             : ", len(fifo.trace))
-        print("Total Runtime            : ", fifo.runtime)
-
-        for element in fifo.trace:
-            print(element)
-        for tax_row in fifo.group_as_tax_rows():
-            print(tax_row)
-
-
-def tax_table(fifo: FIFO):
-    """Group munches into tax rows identified by (tx, st) pair"""
+        fifos = read_book(log, filename, key, stats=stats).fifos
+    if format in RECORD_FORMATS and not stream:
+        with RecordWriter(sys.stdout, format, () if key is None else (key,)) as writer:
+            for key_value, fifo in fifos.items():
+                writer.write(fifo.trace, () if key is None else (key_value,))
+        fifos = {}
+    for key_value, fifo in fifos.items():
+        if key_value is not None:
+            print(f'{key} {key_value}')
+        if format == 'rich':
+            print_rich(fifo)
+        else:
+            print_plain(fifo)
+    if stats is not None:
+        print('Profile', file=sys.stderr)
+        print(stats, file=sys.stderr)
+
+
+def print_rich(fifo: FIFO):
+    console = Console()
+    print('All transactions')
+    console.print(trace_table(fifo.trace))
+    print('All transactions grouped by type (ST/LT)')
+    tax_rows = list(fifo.group_as_tax_rows())
+    console.print(tax_table(tax_rows))
+    for tax_row in tax_rows:
+        print(f'Out tx #{tax_row.tx}, {tax_row.qty()} shares, {"ST" if tax_row.st else "LT"}, proceeds {tax_row.proceeds()}, cost basis {tax_row.cb()}')
+        console.print(tax_row)
+        print('\n')
+
+
+def print_plain(fifo: FIFO):
+    write_plain(fifo, sys.stdout)
+
+
+def print_stream(fifo: FIFO, entries: Iterable):
+    """Print each munch as it is produced, and each tax row once its munches are in, then the summary"""
+    trace_length = 0
+    with PlainWriter(sys.stdout) as writer:
+        def munches():
+            nonlocal trace_length
+            for munch in fifo.stream(entries):
+                writer.write(str(munch))
+                trace_length += 1
+                yield munch
+
+        writer.tax_rows(fifo.group_munches_as_tax_rows(munches()))
+        writer.summary(fifo, trace_length)
+
+
+def tax_table(tax_rows: Iterable[TaxRow]):
+    """Tabulate tax rows identified by (tx, st) pair"""
     table = Table(show_header=True, header_style='bold magenta')
     table.add_column('tx')
     table.add_column('qty', width=8)
@@ -58,7 +117,7 @@ def tax_table(fifo: FIFO):
     table.add_column('proceeds',  justify="right")
     table.add_column('cb', justify="right")
     tax_row: TaxRow
-    for tax_row in fifo.group_as_tax_rows():
+    for tax_row in tax_rows:
         tx = tax_row.tx
         qty = str(tax_row.qty())
         st = format_st(tax_row.st)
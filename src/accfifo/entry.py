@@ -1,12 +1,21 @@
 import datetime
 import decimal
 from decimal import Decimal
+from functools import lru_cache
 
 import moneyed
-from moneyed import format_money
 from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Table
 
+from accfifo.l10n import format_money
+
+# Date formats accepted in .csv rows, in the order they are tried:
+DATE_FORMATS = ('%d-%b-%y', '%d-%b-%Y')
+
+# Distinct dates and costs a parser keeps parsed, the least recently
+# used ones first to go:
+CACHE_SIZE = 65536
+
 
 def format_st(st: bool):
     return 'ST' if st else '  '
@@ -28,9 +37,9 @@ def get_qty(row) -> int:
 
 def get_date(row):
     try:
-        return datetime.datetime.strptime(row['Date'], '%d-%b-%y')
+        return datetime.datetime.strptime(row['Date'], DATE_FORMATS[0])
     except ValueError:
-        return datetime.datetime.strptime(row['Date'], '%d-%b-%Y')
+        return datetime.datetime.strptime(row['Date'], DATE_FORMATS[1])
 
 def get_cost(row: dict) -> moneyed.Money:
     try:
@@ -41,7 +50,11 @@ def get_cost(row: dict) -> moneyed.Money:
 class Entry(object):
     """
     Defines an accounting entry.
+
+    Entries are slotted, as a long trace holds millions of them.
     """
+    __slots__ = ('tx', 'quantity', 'price', 'factor', 'date', 'data')
+
     tx: str
     quantity: Decimal
     price: moneyed.Money
@@ -63,8 +76,9 @@ class Entry(object):
         self.data = kwargs
 
     @classmethod
-    def from_row(cls, row: dict):
-        print(f'got row {row}')
+    def from_row(cls, row: dict, log=None):
+        if log is not None:
+            log.debug('got row %s', row)
         return Entry(tx=get_tx(row),
                      quantity=get_qty(row),
                      price=get_cost(row),
@@ -107,11 +121,86 @@ class Entry(object):
         return self.quantity * self.price * self.factor
 
     def copy(self, quantity=None):
-        return Entry(
-            tx=self.tx,
-            quantity=quantity or self.quantity,
-            price=self.price,
-            date=self.date,
-            factor=self.factor,
-            **self.data.copy()
-        )
+        # Bypass __init__ as this is called for every partial fill:
+        entry = Entry.__new__(Entry)
+        entry.tx = self.tx
+        entry.quantity = quantity or self.quantity
+        entry.price = self.price
+        entry.date = self.date
+        entry.factor = self.factor
+        entry.data = self.data.copy() if self.data else {}
+        return entry
+
+    def pack(self) -> tuple:
+        """
+        Returns the entry as a compact tuple which is cheap to pickle.
+
+        Money prices are reduced to their amount and currency code.
+        """
+        price = self.price
+        if isinstance(price, moneyed.Money):
+            price = (price.amount, price.currency.code)
+        return (self.tx, self.quantity, price, self.date, self.factor, dict(self.data) if self.data else None)
+
+    @classmethod
+    def unpack(cls, packed: tuple):
+        """
+        Rebuilds an entry out of a tuple given by `pack`.
+        """
+        (tx, quantity, price, date, factor, data) = packed
+        if isinstance(price, tuple):
+            price = moneyed.Money(*price)
+        return Entry(tx, quantity, price, date, factor, **(data or {}))
+
+
+class RowParser(object):
+    """
+    Parses .csv rows into entries, caching what repeats within a file.
+
+    The date format is detected once and reused for the following rows,
+    and each distinct date and cost string is parsed only once, as long
+    as it is among the latest `CACHE_SIZE`, so that memory stays bounded
+    however many distinct strings a file has. Use one parser per file.
+    """
+
+    def __init__(self, currency='USD'):
+        self.currency = currency
+        self.date_format = None
+        self.date = lru_cache(maxsize=CACHE_SIZE)(self._date)
+        self.cost = lru_cache(maxsize=CACHE_SIZE)(self._cost)
+
+    def _detect(self, text: str) -> datetime.datetime:
+        for date_format in DATE_FORMATS:
+            try:
+                date = datetime.datetime.strptime(text, date_format)
+            except ValueError:
+                continue
+            self.date_format = date_format
+            return date
+        raise ValueError(f'Unknown date format {text!r}')
+
+    def _date(self, text: str) -> datetime.datetime:
+        try:
+            return datetime.datetime.strptime(text, self.date_format)
+        except (TypeError, ValueError):
+            # No format detected yet, or the format changed mid-file:
+            return self._detect(text)
+
+    def _cost(self, text: str) -> moneyed.Money:
+        try:
+            return moneyed.Money(text, self.currency)
+        except decimal.InvalidOperation as e:
+            raise RuntimeError(f'Cannot convert {text!r}') from e
+
+    def entry(self, row: dict, log=None, columns=()) -> Entry:
+        """
+        Parses the row into an entry, keeping the given extra columns
+        as entry data.
+        """
+        if log is not None:
+            log.debug('got row %s', row)
+        return Entry(tx=get_tx(row),
+                     quantity=get_qty(row),
+                     price=self.cost(row['Cost']),
+                     date=self.date(row['Date']),
+                     **{column: row[column] for column in columns})
@@ -1,13 +1,57 @@
+import bisect
 import datetime
+import heapq
+import itertools
+import time
 from collections import deque
+from decimal import Decimal
+from operator import attrgetter
 
-from typing import Iterable
+from typing import Iterable, NamedTuple
 
+import moneyed
 from typing_extensions import Generator
 
 from accfifo.entry import Entry
+from accfifo.history import History, Position
+from accfifo.lot import Lots
+from accfifo.minor import DEFAULT_SCALE, Amounts, MinorUnits
 from accfifo.munch import Munch
-from accfifo.tax_row import TaxRow
+from accfifo.relief import INVENTORIES
+from accfifo.stats import Stats
+from accfifo.tax_row import TaxRow, group_tax_rows
+
+ENGINES = ('python', 'numpy')
+RUN_LIMIT = 1024
+NUMERICS = ('money', 'minor')
+RELIEFS = ('fifo',) + tuple(INVENTORIES)
+CHECKPOINT_INTERVAL = 4096
+
+_date = attrgetter('date')
+
+
+def _factored(value, factor):
+    """
+    Returns the value times the factor, taking float factors the way
+    Money arithmetic does.
+    """
+    if isinstance(factor, float) and isinstance(value, Decimal):
+        factor = Decimal(str(factor))
+    return value * factor
+
+
+class _Checkpoint(NamedTuple):
+    """
+    The state of a FIFO accounting before the entry at `index` of the
+    date-sorted entries, which a backdated entry is replayed from.
+    """
+    index: int
+    lots: list[Entry]
+    balance: int
+    aggregates: tuple
+    closed: bool
+    trace_length: int
+    history_length: int
 
 
 class FIFO(object):
@@ -16,12 +60,75 @@ class FIFO(object):
     the inventory in hand, (2) calculating the historical PnL trace.
     """
 
-    def __init__(self, entries=None):
+    def __init__(self, entries=None, check=False, engine='python', trace=None, numeric='money',
+                 scale=DEFAULT_SCALE, stats: Stats | None = None, coalesce=False,
+                 relief='fifo', sort=False, history=False):
         """
         Initializes and computes the FIFO accounting.
 
-        Note that entries are supposed to be sorted.
+        Note that entries are supposed to be sorted, unless `sort` is
+        set. Then entries are sorted by date as needed, and entries
+        dated before those seen so far are replayed from the latest
+        checkpoint before them (see `insert`). This needs a list trace,
+        and keeps a copy of every entry seen for the life of the FIFO,
+        along with a copy of the inventory every `CHECKPOINT_INTERVAL`
+        entries or more, since an entry may be backdated to any date.
+
+        If `history` is set, the balance and the valuation are recorded
+        after each entry, so that `as_of` tells the stock, valuation and
+        average cost as of any date without computing again.
+
+        If `check` is set, the running valuation and PnL aggregates are
+        compared with a full recompute after every computation step.
+
+        The `engine` is either 'python' which matches lots one entry at
+        a time, or 'numpy' which matches all the given entries at once
+        with batched array operations (see `accfifo.vectorized`). Either
+        way, entries added later are matched by the Python engine.
+
+        The `trace` is where munches are appended to, a new list by
+        default. It may be any list-like sink, such as a `TraceStore`
+        which keeps the trace out of core.
+
+        The `numeric` mode is either 'money' which sums up the running
+        aggregates as the Decimal amounts of the Money prices, or 'minor'
+        which sums them up as integers of 1/`scale` currency units.
+        Either way, Money is built only when they are read, and prices
+        must be of a single currency. Results are identical as long as
+        all prices are representable in those units.
+
+        If `stats` are given, the engine counts and times what it does
+        into them (see `Stats`). Otherwise it does not spend any time on
+        that.
+
+        If `coalesce` is set, adjacent inventory lots of equal price,
+        date, factor and data are merged into one `Lot`, which keeps
+        the entries it is made of. Many small alike buys then make a
+        short inventory which is closed in a few steps, while the trace
+        is the same as without merging.
+
+        The `relief` method picks the lots closing entries are matched
+        against: 'fifo' (first-in-first-out), 'lifo' (last-in-first-out),
+        'hifo' (highest price first, lowest for short lots) or 'specific'
+        (the lots a closing entry names by their tx, see
+        `accfifo.relief.SpecificInventory`, then first-in-first-out).
+        Only 'fifo' supports the numpy engine and coalescing.
         """
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine {engine!r}, expected one of {ENGINES}')
+        if numeric not in NUMERICS:
+            raise ValueError(f'Unknown numeric mode {numeric!r}, expected one of {NUMERICS}')
+        if relief not in RELIEFS:
+            raise ValueError(f'Unknown relief method {relief!r}, expected one of {RELIEFS}')
+        if relief != 'fifo' and (engine != 'python' or coalesce):
+            raise ValueError(f'The {relief!r} relief method requires the python engine without coalescing')
+        if sort and engine != 'python':
+            raise ValueError('Sorting entries requires the python engine')
+        if history and engine != 'python':
+            raise ValueError('Recording the history requires the python engine')
+        if sort and trace is not None and not isinstance(trace, list):
+            raise ValueError('Sorting entries needs a list trace, as backdated entries truncate it')
+
         # Mark the start timestamp:
         self._started_at = datetime.datetime.now()
         self._finished_at = None
@@ -31,12 +138,100 @@ class FIFO(object):
 
         # Declare and initialize private fields to be used during computing:
         self._balance = 0
-        self.inventory: deque[Entry] = deque()
-        self.trace: list[Munch] = []
+        self._valuation = 0
+        self._valuation_factored = 0
+        self._pnl = 0
+        self._pnl_factored = 0
+        self._closed = False
+        self._date = None
+        self._resumed = False
+        self._resumed_date = None
+        self._tax_rows = None
+        self.stats = stats
+        self._check = check
+        self._engine = engine
+        self._units = MinorUnits(scale) if numeric == 'minor' else Amounts()
+        if relief != 'fifo':
+            self._set_inventory(INVENTORIES[relief]())
+        else:
+            self._set_inventory(Lots() if coalesce else deque())
+        self.trace: list[Munch] = [] if trace is None else trace
+        self._record = self._record_lot if coalesce else self.trace.append
+
+        # Keep the entries seen so far in date order, along with the
+        # checkpoints to replay backdated entries from:
+        self._sort = sort
+        self._sorted: list[Entry] = []
+        self._checkpoints: list[_Checkpoint] = []
+        self._history = History() if history else None
 
         # Start computing:
         self._compute()
 
+    @classmethod
+    def from_state(cls, inventory, balance, trace=(), aggregates=None, date=None, **options):
+        """
+        Builds a FIFO accounting out of a previously computed inventory,
+        balance and (optionally) trace, to be continued with new entries.
+
+        The running aggregates are recomputed unless they are given as
+        returned by `_aggregates`, which is required to keep the PnL of
+        a dropped trace.
+
+        The `date` is that of the last entry the state was computed
+        from (see `date`). In the `history` mode, the state is recorded
+        as of that date, and `as_of` refuses earlier dates, which the
+        state does not tell about. Likewise, the `sort` mode refuses
+        entries dated before it, which cannot be replayed, and so needs
+        the date.
+        """
+        if options.get('sort') and date is None:
+            raise ValueError('Sorting entries of a resumed accounting needs the date of its state')
+        fifo = cls(**options)
+        fifo.inventory.extend(inventory)
+        fifo.trace.extend(trace)
+        fifo._balance = balance
+        fifo._tax_rows = None
+        fifo._set_aggregates(aggregates if aggregates is not None else fifo._aggregates())
+        fifo._checkpoints = []
+        fifo._date = date
+        fifo._resumed = True
+        fifo._resumed_date = date
+        if fifo._history is not None and date is not None:
+            fifo._history.append(date, balance, fifo._valuation)
+        return fifo
+
+    def _set_inventory(self, inventory):
+        """
+        Sets the inventory, along with its lot selection hook if any.
+        """
+        self.inventory: deque[Entry] = inventory
+        self._select = getattr(inventory, 'select', None)
+
+    @property
+    def aggregates(self):
+        """
+        Returns the running valuation, factored valuation, PnL and factored PnL.
+        """
+        return (self.valuation, self.valuation_factored, self.profit_and_loss, self.profit_and_loss_factored)
+
+    def _set_aggregates(self, aggregates):
+        """
+        Sets the running aggregates out of values as returned by
+        `aggregates` or `_aggregates`.
+        """
+        # Anything closed sums up to Money, or to a plain amount:
+        self._closed = isinstance(aggregates[2], moneyed.Money) or aggregates[2] != 0
+        aggregates = tuple(self._units(value) if isinstance(value, moneyed.Money) else value for value in aggregates)
+        (self._valuation, self._valuation_factored, self._pnl, self._pnl_factored) = aggregates
+
+    def _reported(self, value, summed):
+        """
+        Returns a running aggregate as the Money arithmetic gives it:
+        Money if anything was summed up, else 0.
+        """
+        return self._units.money(value) if summed else 0
+
     @property
     def is_empty(self):
         """
@@ -56,36 +251,28 @@ class FIFO(object):
         """
         Returns the inventory valuation.
         """
-        return sum([s.quantity * s.price for s in self.inventory])
+        return self._reported(self._valuation, not self.is_empty)
 
     @property
     def valuation_factored(self):
         """
         Returns the inventory valuation which is factored.
         """
-        return sum([s.quantity * s.price * s.factor for s in self.inventory])
+        return self._reported(self._valuation_factored, not self.is_empty)
 
     @property
     def profit_and_loss(self):
         """
         Returns the realized profit and loss.
         """
-        return sum(
-            [e.price * e.quantity for entries_lst in self.trace for e in entries_lst]
-        )
+        return self._reported(self._pnl, self._closed)
 
     @property
     def profit_and_loss_factored(self):
         """
         Returns the realized profit and loss.
         """
-        return sum(
-            [
-                e.price * e.quantity * e.factor
-                for entries_lst in self.trace
-                for e in entries_lst
-            ]
-        )
+        return self._reported(self._pnl_factored, self._closed)
 
     @property
     def avgcost(self):
@@ -103,6 +290,13 @@ class FIFO(object):
         # If we don't have any stock, simply return None, else average:
         return None if self._balance == 0 else (self.valuation_factored / self._balance)
 
+    @property
+    def date(self):
+        """
+        Returns the date of the last entry fed, if any.
+        """
+        return self._date
+
     @property
     def runtime(self):
         """
@@ -112,12 +306,123 @@ class FIFO(object):
             return self._finished_at - self._started_at
         return None
 
+    def as_of(self, date: datetime.date) -> Position:
+        """
+        Returns the stock, valuation and average cost as of the end of
+        the given date, as recorded in the `history` mode. The time of
+        a datetime is ignored, so that all entries of the day count.
+
+        A FIFO accounting resumed from a state (see `from_state`) knows
+        nothing before the date of that state, so earlier dates raise
+        a ValueError.
+        """
+        if self._history is None:
+            raise ValueError('Point-in-time queries require the history mode')
+        end = datetime.datetime.combine(date, datetime.time.max, getattr(date, 'tzinfo', None))
+        i = self._history.find(end)
+        if i < 0:
+            if self._resumed:
+                raise ValueError('No history before the state the accounting was resumed from')
+            return Position(0, 0, None)
+        balance = self._history.balances[i]
+        valuation = self._reported(self._history.valuations[i], balance != 0)
+        return Position(balance, valuation, None if balance == 0 else valuation / balance)
+
+    def _aggregates(self):
+        """
+        Recomputes the valuation and PnL aggregates from scratch out of
+        the inventory and the trace.
+        """
+        return (
+            sum([s.quantity * s.price for s in self.inventory]),
+            sum([s.quantity * s.price * s.factor for s in self.inventory]),
+            sum([e.price * e.quantity for entries_lst in self.trace for e in entries_lst]),
+            sum([e.price * e.quantity * e.factor for entries_lst in self.trace for e in entries_lst]),
+        )
+
+    def _check_aggregates(self):
+        """
+        Checks that the running aggregates match a full recompute.
+
+        This raises rather than asserts, so that the check still runs
+        under `python -O`.
+        """
+        running = self.aggregates
+        expected = self._aggregates()
+        if running != expected:
+            raise AssertionError(f"Running aggregates {running} differ from recomputed {expected}")
+
     def _push(self, entry):
         """
         Pushes the entry to the inventory as new stock movement.
         """
         self.inventory.append(entry)
         self._balance += entry.quantity
+        value = entry.quantity * self._units(entry.price)
+        self._valuation += value
+        factor = entry.factor
+        self._valuation_factored += value if factor == 1 else _factored(value, factor)
+
+    def _close(self, munch):
+        """
+        Records the munch in the trace and moves its inventory side
+        from the valuation to the realized PnL.
+        """
+        (_in, _out) = munch
+        self._record(munch)
+        in_value = _in.quantity * self._units(_in.price)
+        out_value = _out.quantity * self._units(_out.price)
+        (in_factor, out_factor) = (_in.factor, _out.factor)
+        in_factored = in_value if in_factor == 1 else _factored(in_value, in_factor)
+        out_factored = out_value if out_factor == 1 else _factored(out_value, out_factor)
+        self._valuation -= in_value
+        self._valuation_factored -= in_factored
+        self._pnl += in_value + out_value
+        self._pnl_factored += in_factored + out_factored
+        self._closed = True
+
+    def _push_run(self, run):
+        """
+        Pushes a run of same-direction entries to the inventory at once.
+        """
+        if self._history is not None:
+            self._record_run(run)
+        self.inventory.extend(run)
+        self._balance += sum([e.quantity for e in run])
+        units = self._units
+        values = [e.quantity * units(e.price) for e in run]
+        self._valuation += sum(values)
+        self._valuation_factored += sum([
+            value if e.factor == 1 else _factored(value, e.factor) for value, e in zip(values, run)
+        ])
+        if self.stats is not None:
+            self.stats.pushes += len(run)
+            self.stats.max_depth = max(self.stats.max_depth, len(self.inventory))
+
+    def _record_run(self, run):
+        """
+        Records the balance and the valuation after each entry of a run
+        about to be pushed.
+        """
+        values = [e.quantity * self._units(e.price) for e in run]
+        # Skip the current values accumulated from:
+        self._history.extend(
+            [e.date for e in run],
+            itertools.islice(itertools.accumulate([e.quantity for e in run], initial=self._balance), 1, None),
+            itertools.islice(itertools.accumulate(values, initial=self._valuation), 1, None),
+        )
+
+    def _record_lot(self, munch):
+        """
+        Records a munch from a coalesced lot in the trace, as one munch
+        per entry merged into the munched part of the lot.
+        """
+        (lot, _out) = munch
+        entries = lot.entries()
+        if len(entries) == 1:
+            self.trace.append(Munch((entries[0], _out)))
+        else:
+            self.trace.extend([Munch((_in, _out.copy(-_in.quantity))) for _in in entries])
 
     def _fill(self, entry):
         """
@@ -135,6 +440,12 @@ class FIFO(object):
         # OK, let's start with this munch-fill-reverse cycle by
         # creating a copy of the entry:
         entry = entry.copy()
+        stats = self.stats
+
+        # Let the inventory know which lots the entry relieves, if it
+        # cares:
+        if self._select is not None:
+            self._select(entry)
 
         # We will continue as long as the entry has quantity:
         while not entry.zero:
@@ -144,11 +455,15 @@ class FIFO(object):
             if self.is_empty:
                 # Yes, the inventory is empty. Push:
                 self._push(entry)
+                if stats is not None:
+                    stats.reversals += 1
+                    stats.max_depth = max(stats.max_depth, 1)
 
                 # We are done here now! Return:
                 return
 
-            # We have entries in the inventory. Get the earliest:
+            # We have entries in the inventory. Get the earliest (or the
+            # next one to relieve by another relief method):
             earliest = self.inventory.popleft()
 
             # There are 3 possible cases:
@@ -170,9 +485,13 @@ class FIFO(object):
                 # Put earliest back to the inventory if still have quantity:
                 if earliest.quantity != 0:
                     self.inventory.appendleft(earliest)
+                    if stats is not None:
+                        stats.partial += 1
+                elif stats is not None:
+                    stats.full += 1
 
                 # Update the trace:
-                self.trace.append(Munch((munched, entry)))
+                self._close(Munch((munched, entry)))
 
                 # Update the balance:
                 self._balance += entry.quantity
@@ -188,80 +507,344 @@ class FIFO(object):
                 entry.quantity += earliest.quantity
 
                 # Update the trace:
-                self.trace.append(Munch((earliest, munched)))
+                self._close(Munch((earliest, munched)))
+                if stats is not None:
+                    stats.full += 1
 
                 # Update the balance and continue:
                 self._balance += munched.quantity
 
+    def add(self, entry):
+        """
+        Feeds a single new entry into the existing FIFO accounting.
+        """
+        self.extend((entry,))
+
+    def insert(self, entry):
+        """
+        Feeds a single new entry into the existing FIFO accounting,
+        wherever its date falls.
+
+        This requires the `sort` mode. An entry dated before the last
+        one seen rolls the accounting back to the latest checkpoint
+        before it and replays the entries from there on.
+        """
+        if not self._sort:
+            raise ValueError('Inserting entries requires the sort mode')
+        self.extend((entry,))
+
+    def extend(self, entries):
+        """
+        Feeds new entries into the existing FIFO accounting.
+
+        The current inventory, balance and trace are reused, so the
+        result is the same as a full recompute over all entries seen
+        so far, at the cost of the new entries only. Note that entries
+        are supposed to be sorted and to follow the previous ones,
+        unless the `sort` mode is set.
+        """
+        if self._sort:
+            self._extend_sorted(entries)
+        else:
+            self._extend(entries)
+
+    def _extend_sorted(self, entries):
+        """
+        Feeds new entries in date order, replaying the entries seen so
+        far from the latest checkpoint before the earliest new one, if
+        it is backdated.
+        """
+        # Sort the entries only if they are not sorted yet. Sorting is
+        # stable, so entries of the same date keep their order:
+        entries = list(entries)
+        if not all(a.date <= b.date for (a, b) in itertools.pairwise(entries)):
+            entries.sort(key=_date)
+        if not entries:
+            return
+        if self._resumed_date is not None and entries[0].date < self._resumed_date:
+            raise ValueError(
+                f'Entry {entries[0].tx} is dated before the state the accounting was resumed from, '
+                'which cannot be replayed'
+            )
+
+        # Entries of the same date as the last one seen just follow it:
+        start = bisect.bisect_right(self._sorted, entries[0].date, key=_date)
+        if start < len(self._sorted):
+            # Roll back to the latest checkpoint before the entry. Later
+            # checkpoints are taken again while replaying:
+            k = bisect.bisect_right(self._checkpoints, start, key=attrgetter('index')) - 1
+            checkpoint = self._checkpoints[k]
+            del self._checkpoints[k + 1:]
+            self._restore(checkpoint)
+
+            # Replay copies of the entries seen from there on, as the
+            # engine changes the entries it puts into the inventory:
+            replayed = self._sorted[checkpoint.index:]
+            del self._sorted[checkpoint.index:]
+            entries = [e.copy() for e in heapq.merge(replayed, entries, key=_date)]
+
+        # Feed the entries in chunks, taking checkpoints in between:
+        for i in range(0, len(entries), CHECKPOINT_INTERVAL):
+            chunk = entries[i:i + CHECKPOINT_INTERVAL]
+            self._checkpoint()
+            self._sorted.extend([e.copy() for e in chunk])
+            self._extend(chunk)
+
+    def _checkpoint(self):
+        """
+        Takes a checkpoint of the current state, unless the last one is
+        recent. Copying the inventory is paid for by at least as many
+        entries since the last checkpoint.
+        """
+        if self._checkpoints:
+            since = len(self._sorted) - self._checkpoints[-1].index
+            if since < max(CHECKPOINT_INTERVAL, len(self.inventory)):
+                return
+        self._checkpoints.append(_Checkpoint(
+            len(self._sorted),
+            [lot.copy() for lot in self.inventory],
+            self._balance,
+            (self._valuation, self._valuation_factored, self._pnl, self._pnl_factored),
+            self._closed,
+            len(self.trace),
+            len(self._history) if self._history is not None else 0,
+        ))
+
+    def _restore(self, checkpoint: _Checkpoint):
+        """
+        Restores the state of the checkpoint.
+        """
+        # Lots are copied again, as the checkpoint may be restored again:
+        inventory = type(self.inventory)()
+        lots = [lot.copy() for lot in checkpoint.lots]
+        if isinstance(inventory, deque):
+            # Do not merge coalesced lots again:
+            deque.extend(inventory, lots)
+        else:
+            inventory.extend(lots)
+        self._set_inventory(inventory)
+        self._balance = checkpoint.balance
+        (self._valuation, self._valuation_factored, self._pnl, self._pnl_factored) = checkpoint.aggregates
+        self._closed = checkpoint.closed
+        del self.trace[checkpoint.trace_length:]
+        if self._history is not None:
+            self._history.truncate(checkpoint.history_length)
+        self._tax_rows = None
+
+    def _extend(self, entries):
+        """
+        Feeds new entries following the previous ones into the FIFO
+        accounting (see `extend`).
+        """
+        # Start profiling if we are asked to. Parsing happens while
+        # we pull entries, so it is not counted as matching time:
+        stats = self.stats
+        history = self._history
+        if stats is not None:
+            started = time.perf_counter()
+            parsing = stats.parsing
+
+        # Same-direction entries are collected into runs which are
+        # pushed at once, tracking the balance they will lead to:
+        run = []
+        balance = self._balance
+        entry = None
+
+        # We will iterate over the entries and operate on the
+        # inventory. Let's start:
+        try:
+            for entry in entries:
+                quantity = entry.quantity
+
+                # We will add new stock to the inventory or remove
+                # existing stock from the inventory. It looks pretty
+                # straight-forward. But is it?
+                #
+                # There is a special case which is called "short-selling"
+                # in the financial jargon. This is similar to backorders
+                # in the conventional trading of goods which means selling
+                # goods which you don't have in your inventory yet.
+                #
+                # This means that we have the following possible
+                # situations:
+                #
+                # | Stock    | Entry |
+                # |----------|-------|
+                # | positive | buy   |
+                # | positive | sell  |
+                # | negative | buy   |
+                # | negative | sell  |
+                #
+                # As you see, there are two cases which are pretty easy
+                # to handle:
+                #
+                # | Stock    | Entry | Action        |
+                # |----------|-------|---------------|
+                # | positive | buy   | Keep adding   |
+                # | negative | sell  | Keep removing |
+                #
+                # Let's do this:
+                if (balance >= 0 and quantity > 0) or (balance <= 0 and quantity <= 0):
+                    # Yes, we will push the entry to the inventory as is,
+                    # along with the rest of its run:
+                    run.append(entry)
+                    balance += quantity
+                    if len(run) == RUN_LIMIT:
+                        (run, full) = ([], run)
+                        self._push_run(full)
+                # Good, we will now proceed with the more complicated
+                # operation: Closing previously opened stock
+                # positions. This applies to the following cases with the
+                # required actions to be taken respectively.
+                #
+                # | Stock    | Entry | Action                                     |
+                # |----------|-------|--------------------------------------------|
+                # | positive | sell  | Munch from stock (and reverse if required) |
+                # | negative | buy   | Fill backorders (and reverse if required)  |
+                #
+                # Note that we must make sure that we skip "0"-quantity entries.
+                elif quantity != 0:
+                    # The run, if any, is over:
+                    if run:
+                        (run, over) = ([], run)
+                        self._push_run(over)
+
+                    # OK, the entry is not zero. We will proceed to filling of the positions:
+                    self._fill(entry)
+                    balance = self._balance
+                    if history is not None:
+                        history.append(entry.date, balance, self._valuation)
+                    if stats is not None:
+                        stats.fills += 1
+
+                if stats is not None:
+                    stats.entries += 1
+
+                # We are done with the entry. Let's move to the next one.
+        finally:
+            # Push the last run, if any. Entries taken so far are kept
+            # even if the entries fail midway, as without runs. Runs
+            # are cleared before they are pushed, so none is pushed
+            # twice:
+            if run:
+                self._push_run(run)
+
+            # The trace has changed, so have the tax rows:
+            self._tax_rows = None
+
+        if entry is not None:
+            self._date = entry.date
+
+        # This marks the end of the FIFO computation:
+        self._finished_at = datetime.datetime.now()
+        if stats is not None:
+            stats.matching += time.perf_counter() - started - (stats.parsing - parsing)
+
+        # Verify the running aggregates if we are asked to:
+        if self._check:
+            self._check_aggregates()
+
+    def stream(self, entries) -> Generator[Munch]:
+        """
+        Feeds new entries into the existing FIFO accounting like
+        `extend`, and yields the munches they produce as they are
+        produced instead of keeping them in the trace.
+
+        Entries are pulled and matched in chunks, so the munches of a
+        long history are reported in constant memory, starting as soon
+        as the first chunk is matched. The running aggregates, and so
+        the PnL, still count the munches. This needs a list trace, and
+        does not support the `check` and `sort` modes which need the
+        whole trace.
+        """
+        if self._check or self._sort:
+            raise ValueError('Streaming does not support the check and sort modes')
+        if not isinstance(self.trace, list):
+            raise ValueError('Streaming needs a list trace')
+
+        # The trace is only a buffer for the munches of each chunk:
+        start = len(self.trace)
+        entries = iter(entries)
+        while chunk := list(itertools.islice(entries, RUN_LIMIT)):
+            self._extend(chunk)
+            munches = self.trace[start:]
+            del self.trace[start:]
+            yield from munches
+
     def _compute(self):
         """
         Computes the FIFO accounting for the given entries and produces
         the (1) cost of the inventory in hand, (2) historical PnL trace.
         """
-        # We will iterate over the entries and operate on the
-        # inventory. Let's start:
-        for entry in self._entries:
-            # We will add new stock to the inventory or remove
-            # existing stock from the inventory. It looks pretty
-            # straight-forward. But is it?
-            #
-            # There is a special case which is called "short-selling"
-            # in the financial jargon. This is similar to backorders
-            # in the conventional trading of goods which means selling
-            # goods which you don't have in your inventory yet.
-            #
-            # This means that we have the following possible
-            # situations:
-            #
-            # | Stock    | Entry |
-            # |----------|-------|
-            # | positive | buy   |
-            # | positive | sell  |
-            # | negative | buy   |
-            # | negative | sell  |
-            #
-            # As you see, there are two cases which are pretty easy
-            # to handle:
-            #
-            # | Stock    | Entry | Action        |
-            # |----------|-------|---------------|
-            # | positive | buy   | Keep adding   |
-            # | negative | sell  | Keep removing |
-            #
-            # Let's do this:
-            if (self._balance >= 0 and entry.buy) or (
-                    self._balance <= 0 and entry.sell
-            ):
-                # Yes, we will push the entry to the inventory as is:
-                self._push(entry)
-            # Good, we will now proceed with the more complicated
-            # operation: Closing previously opened stock
-            # positions. This applies to the following cases with the
-            # required actions to be taken respectively.
-            #
-            # | Stock    | Entry | Action                                     |
-            # |----------|-------|--------------------------------------------|
-            # | positive | sell  | Munch from stock (and reverse if required) |
-            # | negative | buy   | Fill backorders (and reverse if required)  |
-            #
-            # Note that we must make sure that we skip "0"-quantity entries.
-            elif not entry.zero:
-                # OK, the entry is not zero. We will proceed to filling of the positions:
-                self._fill(entry)
+        if self._engine == 'numpy':
+            self._compute_numpy()
+        else:
+            self.extend(self._entries)
 
-            # We are done with the entry. Let's move to the next one.
+    def _compute_numpy(self):
+        """
+        Computes the FIFO accounting with the vectorized engine.
+
+        Note that, unlike the Python engine, zero-quantity entries never
+        make it to the inventory.
+        """
+        from accfifo import vectorized
+
+        entries = list(self._entries)
+        if not all(isinstance(e.quantity, int) for e in entries):
+            raise TypeError('The numpy engine requires integer quantities')
+        if self.stats is not None:
+            started = time.perf_counter()
+
+        # Match the quantity column and rebuild the munches and the
+        # remaining lots out of the original entries:
+        matching = vectorized.match([e.quantity for e in entries])
+        for o, c, q in zip(matching.opener.tolist(), matching.closer.tolist(), matching.quantity.tolist()):
+            self.trace.append(Munch((entries[o].copy(q), entries[c].copy(-q))))
+        for o, q in zip(matching.lots.tolist(), matching.remaining.tolist()):
+            self.inventory.append(entries[o].copy(q))
+        self._balance = matching.balance
+        if entries:
+            self._date = entries[-1].date
+
+        # Set up the running aggregates for further entries:
+        self._set_aggregates(self._aggregates())
+        self._tax_rows = None
 
         # This marks the end of the FIFO computation:
         self._finished_at = datetime.datetime.now()
+        if self.stats is not None:
+            self.stats.entries += len(entries)
+            self.stats.max_depth = max(self.stats.max_depth, len(self.inventory))
+            self.stats.matching += time.perf_counter() - started
 
     def group_as_tax_rows(self) -> Generator[TaxRow]:
-        """Group munches into tax rows identified by (tx, st) pair"""
-        tax_row = TaxRow()
-        for m in self.trace:
-            (_in, _out) = m
-            if len(tax_row.lots) != 0 and (m.st() != tax_row.st or _out.tx != tax_row.tx):
-                yield tax_row
-                tax_row = TaxRow()
-            tax_row.append(m)
-        if len(tax_row.lots) != 0:
-            yield tax_row
+        """
+        Group munches into tax rows identified by (tx, st) pair.
+
+        The tax rows of a list trace are cached until the trace changes.
+        Other traces, such as a `TraceStore`, are grouped again on each
+        call, so that they are never held in memory as a whole.
+        """
+        if not isinstance(self.trace, list):
+            yield from self._group_as_tax_rows()
+            return
+        # The trace may also have been appended to directly:
+        if self._tax_rows is None or self._tax_rows[0] != len(self.trace):
+            if self.stats is not None:
+                with self.stats.timer('grouping'):
+                    self._tax_rows = (len(self.trace), list(self._group_as_tax_rows()))
+            else:
+                self._tax_rows = (len(self.trace), list(self._group_as_tax_rows()))
+        yield from self._tax_rows[1]
+
+    def _group_as_tax_rows(self) -> Generator[TaxRow]:
+        return self.group_munches_as_tax_rows(self.trace)
+
+    def group_stream_as_tax_rows(self, entries) -> Generator[TaxRow]:
+        """Group the munches of new entries into tax rows as they are produced (see `stream`)"""
+        return self.group_munches_as_tax_rows(self.stream(entries))
+
+    def group_munches_as_tax_rows(self, munches: Iterable[Munch]) -> Generator[TaxRow]:
+        """Group munches of this accounting, such as those of `stream`, into tax rows in its numeric mode"""
+        return group_tax_rows(munches, self._units)
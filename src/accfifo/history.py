@@ -0,0 +1,62 @@
+"""
+Keeps the balance and the valuation of a FIFO accounting entry by
+entry, for point-in-time queries.
+"""
+
+import bisect
+import datetime
+from typing import NamedTuple
+
+
+class Position(NamedTuple):
+    """
+    The stock, valuation and average cost as of a point in time.
+    """
+    stock: int
+    valuation: object
+    avgcost: object
+
+
+class History(object):
+    """
+    Parallel columns of the date, balance and (running, unreported)
+    valuation after each entry which changed the inventory, in the
+    order of the entries.
+
+    Dates are supposed to be sorted, so that the state as of any date
+    is found by binary search.
+    """
+    __slots__ = ('dates', 'balances', 'valuations')
+
+    def __init__(self):
+        self.dates: list[datetime.datetime] = []
+        self.balances: list = []
+        self.valuations: list = []
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, date: datetime.datetime, balance, valuation):
+        self.dates.append(date)
+        self.balances.append(balance)
+        self.valuations.append(valuation)
+
+    def extend(self, dates, balances, valuations):
+        self.dates.extend(dates)
+        self.balances.extend(balances)
+        self.valuations.extend(valuations)
+
+    def truncate(self, length: int):
+        """
+        Drops everything after the first `length` entries.
+        """
+        del self.dates[length:]
+        del self.balances[length:]
+        del self.valuations[length:]
+
+    def find(self, date: datetime.datetime) -> int:
+        """
+        Returns the index of the last entry dated on or before the
+        date, or -1 if there is none.
+        """
+        return bisect.bisect_right(self.dates, date) - 1
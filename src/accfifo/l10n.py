@@ -0,0 +1,32 @@
+"""
+Formats money like `moneyed.format_money`, caching what it formats.
+
+Babel looks the locale up and builds the currency pattern on every
+call, which dominates printing long traces. Here locales are parsed
+once, and each distinct (amount, currency, locale, digits) is formatted
+once.
+"""
+
+from functools import lru_cache
+
+import moneyed
+from babel import Locale
+from babel.numbers import format_currency
+from moneyed.l10n import LC_NUMERIC
+
+
+@lru_cache(maxsize=None)
+def _locale(locale: str) -> Locale:
+    return Locale.parse(locale)
+
+
+@lru_cache(maxsize=65536)
+def _format(amount, currency: str, locale: str, currency_digits: bool) -> str:
+    return format_currency(amount, currency, locale=_locale(locale), currency_digits=currency_digits)
+
+
+def format_money(money: moneyed.Money, locale: str = LC_NUMERIC, currency_digits: bool = True) -> str:
+    """
+    Formats money as `moneyed.format_money` does with the same arguments.
+    """
+    return _format(money.amount, money.currency.code, locale, currency_digits)
@@ -0,0 +1,130 @@
+"""
+Coalesced inventory lots, for inventories of many small alike entries.
+"""
+
+from collections import deque
+
+from accfifo.entry import Entry
+
+
+class Lot(Entry):
+    """
+    An inventory lot merging adjacent entries of equal price, date,
+    factor and data.
+
+    The merged entries are kept as (tx, quantity) pieces in order, so
+    that whatever is munched from the lot can still be attributed to
+    them (see `entries`). Quantity munched from the lot is taken from
+    its earliest pieces, which are dropped lazily: the engine only
+    updates `quantity`, and `total` keeps the sum of the pieces.
+    """
+    __slots__ = ('pieces', 'total')
+
+    @classmethod
+    def of(cls, entry: Entry) -> 'Lot':
+        """
+        Returns a new lot holding a copy of the entry.
+        """
+        lot = cls.__new__(cls)
+        lot.tx = entry.tx
+        lot.quantity = entry.quantity
+        lot.price = entry.price
+        lot.date = entry.date
+        lot.factor = entry.factor
+        lot.data = entry.data.copy() if entry.data else {}
+        lot.pieces = deque([(entry.tx, entry.quantity)])
+        lot.total = entry.quantity
+        return lot
+
+    def accepts(self, entry: Entry) -> bool:
+        """
+        Indicates if the entry can be merged into the lot.
+        """
+        return (entry.price == self.price and entry.date == self.date and entry.factor == self.factor
+                and entry.data == self.data)
+
+    def merge(self, entry: Entry):
+        """
+        Merges the entry into the lot. Zero-quantity entries vanish.
+        """
+        if entry.quantity != 0:
+            self.quantity += entry.quantity
+            self.total += entry.quantity
+            self.pieces.append((entry.tx, entry.quantity))
+
+    def _settle(self):
+        """
+        Drops the quantity munched so far from the earliest pieces.
+        """
+        consumed = self.total - self.quantity
+        pieces = self.pieces
+        while consumed and pieces:
+            (tx, quantity) = pieces[0]
+            if abs(quantity) <= abs(consumed):
+                pieces.popleft()
+                consumed -= quantity
+            else:
+                pieces[0] = (tx, quantity - consumed)
+                consumed = 0
+        self.total = self.quantity
+        if pieces:
+            self.tx = pieces[0][0]
+
+    def copy(self, quantity=None):
+        # Take the earliest pieces making up the quantity:
+        self._settle()
+        lot = Lot.of(self)
+        if quantity is None or quantity == self.quantity:
+            lot.pieces = self.pieces.copy()
+        else:
+            lot.pieces = deque()
+            left = quantity
+            for (tx, piece) in self.pieces:
+                if abs(piece) >= abs(left):
+                    lot.pieces.append((tx, left))
+                    break
+                lot.pieces.append((tx, piece))
+                left -= piece
+            lot.quantity = lot.total = quantity
+        return lot
+
+    def entries(self) -> list[Entry]:
+        """
+        Returns the merged entries left in the lot.
+        """
+        self._settle()
+        entries = []
+        for (tx, quantity) in self.pieces:
+            entry = Entry.copy(self, quantity)
+            entry.tx = tx
+            entries.append(entry)
+        return entries
+
+
+class Lots(deque):
+    """
+    An inventory merging each appended entry into the last lot if it can.
+    """
+
+    def append(self, entry: Entry):
+        if self:
+            last = self[-1]
+            if last.accepts(entry):
+                last.merge(entry)
+                return
+        super().append(Lot.of(entry))
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+
+def expand(inventory):
+    """
+    Iterates over the entries of an inventory, coalesced or not.
+    """
+    for entry in inventory:
+        if isinstance(entry, Lot):
+            yield from entry.entries()
+        else:
+            yield entry
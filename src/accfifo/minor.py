@@ -0,0 +1,109 @@
+"""
+Converts money to and from integer minor units.
+
+Prices are scaled by a power of ten, 10**6 by default, so that
+sub-cent per-share prices stay exact.
+"""
+
+from decimal import Decimal
+
+import moneyed
+
+DEFAULT_SCALE = 10 ** 6
+
+
+def to_minor(price: moneyed.Money, scale: int = DEFAULT_SCALE) -> int:
+    """
+    Returns the amount of the price in minor units.
+
+    Raises ValueError if the amount cannot be represented exactly.
+    """
+    amount = price.amount * scale
+    minor = int(amount)
+    if minor != amount:
+        raise ValueError(f'{price} cannot be represented in 1/{scale} units')
+    return minor
+
+
+def from_minor(value, currency: str, scale: int = DEFAULT_SCALE) -> moneyed.Money:
+    """
+    Returns the money amount of the given minor units.
+    """
+    return moneyed.Money(Decimal(value) / scale, currency)
+
+
+class Amounts(object):
+    """
+    Takes the amounts of the prices of a single currency, so that sums
+    are Decimal arithmetic rather than Money arithmetic. Prices which
+    are not Money are taken as they are.
+    """
+
+    def __init__(self):
+        self.currency = None
+        self._currency = None
+        self._seen = False
+
+    def __call__(self, price):
+        # Currencies are shared, so prices of the currency seen so far
+        # are told by identity:
+        if isinstance(price, moneyed.Money) and price.currency is self._currency:
+            return price.amount
+        return self._convert(self._check(price))
+
+    def _check(self, price):
+        """
+        Checks that the price is of the currency seen so far, if any.
+        """
+        currency = price.currency if isinstance(price, moneyed.Money) else None
+        code = None if currency is None else currency.code
+        if not self._seen:
+            (self.currency, self._currency, self._seen) = (code, currency, True)
+        elif code != self.currency:
+            raise self._mixed(code)
+        return price
+
+    def _mixed(self, code) -> Exception:
+        # As Money arithmetic does:
+        return TypeError(f'Cannot mix {code} with {self.currency} prices')
+
+    def _convert(self, price):
+        return price.amount if isinstance(price, moneyed.Money) else price
+
+    def money(self, value):
+        """
+        Returns the money amount of the given amount.
+        """
+        return value if self.currency is None else moneyed.Money(value, self.currency)
+
+
+class MinorUnits(Amounts):
+    """
+    Converts the prices of a single currency to minor units, caching
+    the conversion of every distinct amount.
+    """
+
+    def __init__(self, scale: int = DEFAULT_SCALE):
+        super().__init__()
+        self.scale = scale
+        self._cache = {}
+
+    def __call__(self, price: moneyed.Money) -> int:
+        if isinstance(price, moneyed.Money) and price.currency is self._currency:
+            minor = self._cache.get(price.amount)
+            if minor is not None:
+                return minor
+        return self._convert(self._check(price))
+
+    def _mixed(self, code) -> Exception:
+        return ValueError(f'Cannot mix {code} with {self.currency} in minor units')
+
+    def _convert(self, price: moneyed.Money) -> int:
+        minor = self._cache[price.amount] = to_minor(price, self.scale)
+        return minor
+
+    def money(self, value) -> moneyed.Money:
+        """
+        Returns the money amount of the given minor units.
+        """
+        return from_minor(value, self.currency, self.scale)
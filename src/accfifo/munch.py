@@ -1,13 +1,15 @@
 import datetime
 
-from moneyed import format_money, Money
+from moneyed import Money
 from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Table
 
 from accfifo.entry import Entry, format_st
+from accfifo.l10n import format_money
 
 
 class Munch(tuple[Entry, Entry]):
+    __slots__ = ()
 
     def __str__(self):
         _in: Entry = self[0]
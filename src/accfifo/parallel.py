@@ -0,0 +1,91 @@
+"""
+Computes independent FIFO accountings on a pool of processes.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Hashable, Iterable
+
+from accfifo.book import Book
+from accfifo.entry import Entry
+from accfifo.fifo import FIFO
+from accfifo.lot import expand
+from accfifo.munch import Munch
+from accfifo.stats import Stats
+
+
+def process_pool(jobs: int) -> ProcessPoolExecutor:
+    """
+    Returns a pool of `jobs` worker processes started by a fork server,
+    or spawned where there is none. Workers are never forked from this
+    process, which may run threads, e.g. PyArrow's, and forking then
+    risks deadlocks.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(method))
+
+
+def _compute_partition(packed_entries: list[tuple], options: dict) -> tuple:
+    """
+    Computes the FIFO accounting of one partition in a worker process.
+
+    Both the entries and the result travel as packed tuples (see
+    `Entry.pack`), which are much cheaper to pickle than entries. Stats,
+    if any, are collected afresh and sent back to be merged.
+    """
+    if options.get('stats') is not None:
+        options = dict(options, stats=Stats())
+    fifo = FIFO(map(Entry.unpack, packed_entries), **options)
+    return (
+        [e.pack() for e in expand(fifo.inventory)],
+        fifo.stock,
+        [(_in.pack(), _out.pack()) for (_in, _out) in fifo.trace],
+        fifo.date,
+        fifo.stats,
+    )
+
+
+def _restore_partition(result: tuple, options: dict) -> FIFO:
+    """
+    Rebuilds the FIFO accounting of a partition computed by a worker.
+    """
+    (inventory, balance, trace, date, stats) = result
+    if stats is not None:
+        options['stats'].merge(stats)
+    return FIFO.from_state(
+        map(Entry.unpack, inventory),
+        balance,
+        [Munch((Entry.unpack(_in), Entry.unpack(_out))) for (_in, _out) in trace],
+        date=date,
+        **options,
+    )
+
+
+def compute_parallel(entries: Iterable[Entry], key: str | Callable[[Entry], Hashable], jobs: int = None,
+                     **options) -> Book:
+    """
+    Partitions the entries by key and computes the FIFO accounting of
+    each partition on a pool of `jobs` processes (all cores by default).
+
+    The result is the same as `Book(key, entries, **options)`: keys keep
+    the order of their first entry regardless of which worker finishes
+    first.
+    """
+    book = Book(key, **options)
+
+    # Partition the entries by key, in order of appearance:
+    partitions: dict[Hashable, list[tuple]] = {}
+    for entry in entries:
+        partitions.setdefault(book.key_of(entry), []).append(entry.pack())
+
+    # Compute the partitions. Note that map() yields results in order:
+    jobs = jobs or os.cpu_count() or 1
+    with process_pool(jobs) as executor:
+        chunksize = max(1, len(partitions) // (4 * jobs))
+        results = executor.map(partial(_compute_partition, options=options), partitions.values(), chunksize=chunksize)
+        for key_value, result in zip(partitions, results):
+            book.fifos[key_value] = _restore_partition(result, options)
+
+    return book
@@ -1,15 +1,130 @@
 import csv
+import io
+import itertools
 import logging
+import os
 import sys
+import time
+from collections import deque
+from functools import lru_cache, partial
+from typing import Iterator
 
-from accfifo.entry import Entry
+import moneyed
+
+from accfifo.book import Book
+from accfifo.entry import CACHE_SIZE, Entry, RowParser
 from accfifo.fifo import FIFO
+from accfifo.parallel import process_pool
+from accfifo.stats import Stats
+
+# The size of the chunks a .csv is parsed in on several processes:
+CHUNK_BYTES = 1 << 22
 
 
-def read_csv(log, filename) -> FIFO:
+def iter_csv(log, filename, log_rows=False, columns=(), stats: Stats | None = None) -> Iterator[Entry]:
+    """Lazily yield entries from a .csv, one row at a time, keeping extra columns as entry data"""
     with open(filename) as csvfile:
         reader = csv.DictReader(csvfile)
-        entries = [Entry.from_row(row) for row in reader]
-        # for entry in entries:
-        #     print(entry)
-        return FIFO(entries)
+        row_log = log if log_rows else None
+        parser = RowParser()
+        if stats is None:
+            for row in reader:
+                yield parser.entry(row, row_log, columns)
+            return
+        # Time reading and parsing, but not what the consumer does in between:
+        started = time.perf_counter()
+        for row in reader:
+            entry = parser.entry(row, row_log, columns)
+            stats.parsing += time.perf_counter() - started
+            yield entry
+            started = time.perf_counter()
+        stats.parsing += time.perf_counter() - started
+
+
+def split_csv(filename, chunks: int) -> tuple[list[str], list[tuple[int, int]]]:
+    """Split a .csv into its header and about `chunks` byte ranges of whole lines (no quoted newlines)"""
+    with open(filename, 'rb') as csvfile:
+        header = next(csv.reader([csvfile.readline().decode()]))
+        start = csvfile.tell()
+        size = os.fstat(csvfile.fileno()).st_size
+        step = max(1, (size - start) // chunks)
+        ranges = []
+        while start < size:
+            # Extend each range to the end of the line it stops in:
+            csvfile.seek(min(start + step, size))
+            csvfile.readline()
+            end = min(csvfile.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def _parse_chunk(byte_range: tuple[int, int], filename, header: list[str], columns=()) -> list[tuple]:
+    """Parse a byte range of a .csv into packed entries (see Entry.pack), in a worker process"""
+    (start, end) = byte_range
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(start)
+        text = csvfile.read(end - start).decode()
+    parser = RowParser()
+    return [parser.entry(row, columns=columns).pack() for row in csv.DictReader(io.StringIO(text), fieldnames=header)]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _money(price: tuple) -> moneyed.Money:
+    # Rebuild each distinct price once, as the parser does:
+    return moneyed.Money(*price)
+
+
+def iter_csv_parallel(log, filename, jobs: int = None, columns=(), stats: Stats | None = None) -> Iterator[Entry]:
+    """
+    Yield entries from a .csv parsed in chunks on a pool of `jobs`
+    processes, in file order.
+
+    Chunks are at most about `CHUNK_BYTES` long, only `2 * jobs` are
+    parsed ahead of the consumer, and the caches of distinct prices and
+    dates are bounded, so memory stays bounded however large the file
+    is.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    chunks = max(4 * jobs, os.path.getsize(filename) // CHUNK_BYTES)
+    header, ranges = split_csv(filename, chunks)
+    if log is not None:
+        log.debug('parsing %s in %d chunks on %d processes', filename, len(ranges), jobs)
+    parse = partial(_parse_chunk, filename=filename, header=header, columns=columns)
+    with process_pool(jobs) as executor:
+        # Keep a window of chunks being parsed, and take them in order:
+        ranges = iter(ranges)
+        pending = deque(executor.submit(parse, byte_range) for byte_range in itertools.islice(ranges, 2 * jobs))
+        started = time.perf_counter()
+        while pending:
+            chunk = pending.popleft().result()
+            byte_range = next(ranges, None)
+            if byte_range is not None:
+                pending.append(executor.submit(parse, byte_range))
+            entries = []
+            for (tx, quantity, price, date, factor, data) in chunk:
+                entries.append(Entry(tx, quantity, _money(price), date, factor, **(data or {})))
+            del chunk
+            if stats is not None:
+                stats.parsing += time.perf_counter() - started
+            yield from entries
+            started = time.perf_counter()
+
+
+def _iter_entries(log, filename, log_rows=False, columns=(), stats: Stats | None = None, jobs=1) -> Iterator[Entry]:
+    if jobs > 1:
+        if log_rows:
+            raise ValueError('Rows cannot be logged while parsing on several processes')
+        return iter_csv_parallel(log, filename, jobs, columns, stats)
+    return iter_csv(log, filename, log_rows, columns, stats)
+
+
+def read_csv(log, filename, engine='python', log_rows=False, stats: Stats | None = None, jobs=1) -> FIFO:
+    # Entries are streamed straight into the engine and never held as a whole list:
+    return FIFO(_iter_entries(log, filename, log_rows, stats=stats, jobs=jobs), engine=engine, stats=stats)
+
+
+def read_book(log, filename, key, log_rows=False, jobs=1, **options) -> Book:
+    # One FIFO per distinct value of the key column, e.g. Symbol or Account:
+    entries = _iter_entries(log, filename, log_rows, columns=(key,), stats=options.get('stats'), jobs=jobs)
+    return Book(key, entries, **options)
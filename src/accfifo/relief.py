@@ -0,0 +1,179 @@
+"""
+Inventories relieving lots in other orders than first-in-first-out.
+
+Each inventory works like the deque of the FIFO engine: lots are added
+with `append`/`extend`, the next lot to relieve is taken with `popleft`
+and the rest of a partially relieved lot is put back with `appendleft`.
+Iterating yields the open lots in the order they were added.
+"""
+
+import heapq
+import itertools
+from collections import deque
+
+from accfifo.entry import Entry
+
+# The item of `Entry.data` naming the lots a closing entry relieves:
+LOT_KEY = 'lot'
+
+
+class LIFOInventory(object):
+    """
+    Relieves the latest lot first.
+    """
+    __slots__ = ('_lots',)
+
+    def __init__(self):
+        self._lots: list[Entry] = []
+
+    def __len__(self):
+        return len(self._lots)
+
+    def __iter__(self):
+        return iter(self._lots)
+
+    def append(self, lot: Entry):
+        self._lots.append(lot)
+
+    def extend(self, lots):
+        self._lots.extend(lots)
+
+    def popleft(self) -> Entry:
+        return self._lots.pop()
+
+    def appendleft(self, lot: Entry):
+        self._lots.append(lot)
+
+
+class HIFOInventory(object):
+    """
+    Relieves the lot of the highest price first, or of the lowest price
+    for short lots, i.e. the one realizing the lowest gain. Lots of the
+    same price are relieved first-in-first-out.
+
+    The heap holds the keys of the lots, while the lots are kept by
+    sequence number in the order they were added, so that iterating
+    needs no sorting. The lot popped last is only dropped from them
+    once it is known not to be put back.
+    """
+    __slots__ = ('_heap', '_lots', '_seq', '_last', '_popped')
+
+    def __init__(self):
+        self._heap: list[tuple] = []
+        self._lots: dict[int, Entry] = {}
+        self._seq = itertools.count()
+        self._last = None
+        self._popped = False
+
+    def _drop_popped(self):
+        if self._popped:
+            del self._lots[self._last[1]]
+            self._popped = False
+
+    def __len__(self):
+        return len(self._lots) - self._popped
+
+    def __iter__(self):
+        self._drop_popped()
+        return iter(self._lots.values())
+
+    def append(self, lot: Entry):
+        self._drop_popped()
+        seq = next(self._seq)
+        self._lots[seq] = lot
+        heapq.heappush(self._heap, (-lot.price if lot.quantity > 0 else lot.price, seq))
+
+    def extend(self, lots):
+        for lot in lots:
+            self.append(lot)
+
+    def popleft(self) -> Entry:
+        self._drop_popped()
+        self._last = heapq.heappop(self._heap)
+        self._popped = True
+        return self._lots[self._last[1]]
+
+    def appendleft(self, lot: Entry):
+        # This is the rest of the lot just popped, which keeps its place:
+        heapq.heappush(self._heap, self._last)
+        self._lots[self._last[1]] = lot
+        self._popped = False
+
+
+class SpecificInventory(object):
+    """
+    Relieves the lots a closing entry names by their tx in its data,
+    such as `Entry(..., lot='t3')` or `Entry(..., lot=['t3', 't5'])`,
+    and then falls back to first-in-first-out.
+
+    Lots are indexed by their tx, so naming one is as cheap as taking
+    the earliest. Open lots must have distinct txs.
+    """
+    __slots__ = ('_lots', '_order', '_index', '_seq', '_wanted', '_last')
+
+    def __init__(self):
+        self._lots: dict[int, Entry] = {}
+        self._order: deque[int] = deque()
+        self._index: dict[str, int] = {}
+        self._seq = itertools.count()
+        self._wanted: deque[str] = deque()
+        self._last = None
+
+    def __len__(self):
+        return len(self._lots)
+
+    def __iter__(self):
+        return (self._lots[seq] for seq in self._order if seq in self._lots)
+
+    def append(self, lot: Entry):
+        if lot.tx in self._index:
+            raise ValueError(f'A lot of tx {lot.tx!r} is open already, lots must have distinct txs')
+        seq = next(self._seq)
+        self._lots[seq] = lot
+        self._order.append(seq)
+        self._index[lot.tx] = seq
+
+        # Relieved lots are dropped from the order lazily, so keep it
+        # from growing much longer than the inventory:
+        if len(self._order) > 2 * len(self._lots) + 64:
+            self._order = deque(seq for seq in self._order if seq in self._lots)
+
+    def extend(self, lots):
+        for lot in lots:
+            self.append(lot)
+
+    def select(self, closer: Entry):
+        """
+        Selects the lots named by the closing entry to be relieved next.
+        """
+        wanted = closer.data.get(LOT_KEY)
+        self._wanted = deque([wanted] if isinstance(wanted, str) else (wanted or ()))
+
+    def popleft(self) -> Entry:
+        # Take the next named lot still open, if any:
+        while self._wanted:
+            seq = self._index.get(self._wanted[0])
+            if seq in self._lots:
+                break
+            self._wanted.popleft()
+        else:
+            # Otherwise take the earliest lot:
+            while self._order[0] not in self._lots:
+                self._order.popleft()
+            seq = self._order[0]
+        self._last = seq
+        lot = self._lots.pop(seq)
+        del self._index[lot.tx]
+        return lot
+
+    def appendleft(self, lot: Entry):
+        # This is the rest of the lot just popped, which keeps its place:
+        self._lots[self._last] = lot
+        self._index[lot.tx] = self._last
+
+
+INVENTORIES = {
+    'lifo': LIFOInventory,
+    'hifo': HIFOInventory,
+    'specific': SpecificInventory,
+}
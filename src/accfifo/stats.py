@@ -0,0 +1,63 @@
+"""
+Counters and timers of the FIFO engine, for profiling.
+"""
+
+import time
+from contextlib import contextmanager
+
+COUNTERS = ('entries', 'pushes', 'fills', 'full', 'partial', 'reversals', 'max_depth')
+TIMERS = ('parsing', 'matching', 'grouping')
+
+
+class Stats(object):
+    """
+    Collects what the FIFO engine does when given to `FIFO(stats=...)`:
+
+    - entries: entries processed,
+    - pushes: entries pushed to the inventory as is,
+    - fills: entries filled against the inventory,
+    - full, partial: inventory lots consumed entirely or in part,
+    - reversals: fills which reversed the sign of the balance,
+    - max_depth: the largest inventory size after a push,
+
+    and the seconds spent parsing, matching and grouping tax rows.
+
+    A FIFO without stats skips all of this. One object may be shared by
+    several FIFOs, such as those of a `Book`, to collect their totals.
+    """
+    __slots__ = COUNTERS + TIMERS
+
+    def __init__(self):
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        for name in TIMERS:
+            setattr(self, name, 0.0)
+
+    @contextmanager
+    def timer(self, phase: str):
+        """
+        Adds the time spent in the block to the given phase.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, phase, getattr(self, phase) + time.perf_counter() - started)
+
+    def merge(self, other: 'Stats'):
+        """
+        Adds the counters and timers of the other stats to these ones.
+        """
+        for name in COUNTERS + TIMERS:
+            if name == 'max_depth':
+                self.max_depth = max(self.max_depth, other.max_depth)
+            else:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in COUNTERS + TIMERS}
+
+    def __str__(self):
+        lines = [f'{name.replace("_", " ").capitalize():25}: {getattr(self, name):,}' for name in COUNTERS]
+        lines += [f'{name.capitalize() + " time":25}: {getattr(self, name):.6f} s' for name in TIMERS]
+        return '\n'.join(lines)
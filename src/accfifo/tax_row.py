@@ -1,41 +1,63 @@
 from decimal import Decimal
+from typing import Iterable
+
+from typing_extensions import Generator
 
 from rich.console import Console, ConsoleOptions, RenderResult
 from rich.segment import Segment
 from rich.table import Table
 
 from accfifo.entry import format_st
+from accfifo.l10n import format_money
+from accfifo.minor import Amounts
 from accfifo.munch import Munch
 
-from moneyed import format_money, Money
+from moneyed import Money
 
 class TaxRow:
+    __slots__ = ('tx', 'st', 'lots', 'units', '_qty', '_cb', '_proceeds')
+
     tx: str
     st: bool
     lots: list[Munch]
 
-    def __init__(self):
+    def __init__(self, units: Amounts | None = None):
+        # Sum up in the units of the FIFO if given, see FIFO(numeric=...):
         self.tx = ""
         self.st = False
         self.lots = []
+        self.units = units
+        # Running totals of the lots:
+        self._qty = 0
+        self._cb = 0
+        self._proceeds = 0
 
     def append(self, m: Munch):
         if len(self.lots) == 0:
             self.tx = m.out_tx()
             self.st = m.st()
         self.lots.append(m)
+        self._qty += m.qty()
+        if self.units is not None:
+            (_in, _out) = m
+            self._cb += _in.quantity * self.units(_in.price)
+            self._proceeds += _out.quantity * self.units(_out.price)
+        else:
+            self._cb += m.cb()
+            self._proceeds += m.proceeds()
 
     def qty(self) -> Decimal:
-        # noinspection PyTypeChecker
-        return sum([m.qty() for m in self.lots])
+        return self._qty
 
     def cb(self) -> Money:
-        # noinspection PyTypeChecker
-        return sum([m.cb() for m in self.lots])
+        if self.units is not None:
+            return self.units.money(self._cb)
+        return self._cb
 
     def proceeds(self) -> Money:
-        # noinspection PyTypeChecker
-        return -sum([m.proceeds() for m in self.lots])
+        if self.units is not None:
+            return self.units.money(-self._proceeds)
+        return -self._proceeds
 
     def __str__(self):
         st = format_st(self.st)
@@ -49,6 +71,19 @@ class TaxRow:
         # proceeds = format_money(self.proceeds())
         yield trace_table(self.lots)
 
+def group_tax_rows(munches: Iterable[Munch], units: Amounts | None = None) -> Generator[TaxRow]:
+    """Group consecutive munches into tax rows identified by (tx, st) pair, as they come"""
+    tax_row = TaxRow(units)
+    for m in munches:
+        (_in, _out) = m
+        if len(tax_row.lots) != 0 and (m.st() != tax_row.st or _out.tx != tax_row.tx):
+            yield tax_row
+            tax_row = TaxRow(units)
+        tax_row.append(m)
+    if len(tax_row.lots) != 0:
+        yield tax_row
+
+
 def trace_table(trace: list[Munch]) -> Table:
     table = Table(show_header=True, header_style='bold magenta')
     table.add_column('in')
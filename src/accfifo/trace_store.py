@@ -0,0 +1,123 @@
+"""
+Stores a FIFO trace out of core, in a memory-mapped file of fixed-width
+munch records.
+"""
+
+import datetime
+import mmap
+import os
+import struct
+from typing import Iterator
+
+from accfifo.entry import Entry
+from accfifo.minor import DEFAULT_SCALE, from_minor, to_minor
+from accfifo.munch import Munch
+
+EPOCH = datetime.datetime(1970, 1, 1)
+NO_DATE = -2 ** 63
+
+
+class TraceStore(object):
+    """
+    A list-like trace of munches kept in a binary file.
+
+    Every munch is appended as a fixed-width record holding, for both of
+    its entries, the tx id, the quantity, the price in integer minor
+    units, the date in microseconds since the epoch and the factor.
+    Reading maps the file and decodes records on access, so munches are
+    lightweight views which are never all in memory at once. It can be
+    given to `FIFO` as its trace.
+
+    Note that all prices must be in the store's currency, quantities
+    must be whole numbers (they are stored as 64-bit integers), tx ids
+    must fit in `tx_width` bytes, and entry data is not stored. An existing
+    file is truncated unless `reset` is False.
+    """
+
+    def __init__(self, filename, currency='USD', scale=DEFAULT_SCALE, tx_width=32, reset=True):
+        self.filename = filename
+        self.currency = currency
+        self.scale = scale
+        self.tx_width = tx_width
+        self._side = f'{tx_width}sqqqd'
+        self._record = struct.Struct(f'<{self._side}{self._side}')
+        self._file = open(filename, 'w+b' if reset else 'a+b')
+        self._count = os.path.getsize(filename) // self._record.size
+        self._map = None
+        self._mapped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def _pack_side(self, entry: Entry) -> tuple:
+        if entry.price.currency.code != self.currency:
+            raise ValueError(f'Expected a {self.currency} price, got {entry.price}')
+        tx = str(entry.tx).encode()
+        if len(tx) > self.tx_width:
+            raise ValueError(f'Tx id {entry.tx!r} is longer than {self.tx_width} bytes')
+        quantity = entry.quantity
+        if type(quantity) is not int:
+            if quantity != int(quantity):
+                raise ValueError(f'Quantity {quantity} of tx {entry.tx!r} is fractional, '
+                                 f'which a TraceStore cannot keep')
+            quantity = int(quantity)
+        date = NO_DATE if entry.date is None else (entry.date - EPOCH) // datetime.timedelta(microseconds=1)
+        return (tx, quantity, to_minor(entry.price, self.scale), date, entry.factor)
+
+    def _unpack_side(self, tx, quantity, price, date, factor) -> Entry:
+        return Entry(
+            tx.rstrip(b'\0').decode(),
+            quantity,
+            from_minor(price, self.currency, self.scale),
+            None if date == NO_DATE else EPOCH + datetime.timedelta(microseconds=date),
+            int(factor) if factor.is_integer() else factor,
+        )
+
+    def append(self, munch: Munch):
+        (_in, _out) = munch
+        self._file.write(self._record.pack(*self._pack_side(_in), *self._pack_side(_out)))
+        self._count += 1
+
+    def extend(self, munches):
+        for munch in munches:
+            self.append(munch)
+
+    def _mapping(self) -> mmap.mmap:
+        # Flush pending records and remap the file if it has grown:
+        if self._mapped != self._count:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = self._count
+        return self._map
+
+    def _munch(self, mapping: mmap.mmap, index: int) -> Munch:
+        fields = self._record.unpack_from(mapping, index * self._record.size)
+        return Munch((self._unpack_side(*fields[:5]), self._unpack_side(*fields[5:])))
+
+    def __getitem__(self, index: int) -> Munch:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('trace index out of range')
+        return self._munch(self._mapping(), index)
+
+    def __iter__(self) -> Iterator[Munch]:
+        # Like a list, this also yields munches appended while iterating:
+        index = 0
+        while index < self._count:
+            yield self._munch(self._mapping(), index)
+            index += 1
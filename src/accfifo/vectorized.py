@@ -0,0 +1,106 @@
+"""
+Vectorized FIFO lot-matching for bulk recomputation.
+
+This module requires NumPy, which is an optional dependency.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Matching(NamedTuple):
+    """
+    The result of a FIFO lot-matching over a quantity column.
+
+    Munches are given as parallel arrays of the opening entry index,
+    the closing entry index and the matched quantity (signed as the
+    opening entry), ordered as the Python engine produces them. The
+    final inventory is given as the opening entry indices and their
+    remaining (signed) quantities.
+    """
+    opener: np.ndarray
+    closer: np.ndarray
+    quantity: np.ndarray
+    lots: np.ndarray
+    remaining: np.ndarray
+    balance: int
+
+
+def _match_side(opened, closed):
+    """
+    Matches the closed quantities against the opened quantities of
+    one side (long or short) in FIFO order.
+
+    Both arguments are absolute quantity columns indexed by entry.
+    Returns the opener indices, closer indices and quantities of the
+    munches, plus the opener indices and quantities left open.
+    """
+    openers = np.flatnonzero(opened)
+    closers = np.flatnonzero(closed)
+    sizes = opened[openers]
+
+    # Each opener occupies the range [open_start, open_end) in the
+    # cumulative opened quantity, and each closer consumes the range
+    # [close_start, close_end) of that same axis, as FIFO relieves the
+    # earliest lots first:
+    open_end = np.cumsum(sizes)
+    open_start = open_end - sizes
+    close_end = np.cumsum(closed[closers])
+    close_start = close_end - closed[closers]
+
+    # Find the first and the last+1 opener overlapping each closer:
+    first = np.searchsorted(open_end, close_start, side='right')
+    last = np.searchsorted(open_start, close_end, side='left')
+    counts = last - first
+
+    # Expand into one row per (opener, closer) overlap:
+    closer_pos = np.repeat(np.arange(len(closers)), counts)
+    offsets = np.arange(len(closer_pos)) - np.repeat(np.cumsum(counts) - counts, counts)
+    opener_pos = np.repeat(first, counts) + offsets
+    quantity = (np.minimum(open_end[opener_pos], close_end[closer_pos])
+                - np.maximum(open_start[opener_pos], close_start[closer_pos]))
+
+    # Whatever lies beyond the total closed quantity is still open:
+    total_closed = close_end[-1] if len(close_end) else 0
+    open_pos = np.flatnonzero(open_end > total_closed)
+    remaining = open_end[open_pos] - np.maximum(open_start[open_pos], total_closed)
+
+    return openers[opener_pos], closers[closer_pos], quantity, openers[open_pos], remaining
+
+
+def match(quantity) -> Matching:
+    """
+    Computes the FIFO lot-matching for the given (signed) quantity column.
+
+    Zero quantities are ignored.
+    """
+    quantity = np.asarray(quantity, dtype=np.int64)
+
+    # Split every entry into its effect on the long and the short
+    # side of the position. A reversing entry closes one side and
+    # opens the other one:
+    after = np.cumsum(quantity)
+    before = after - quantity
+    long_delta = np.maximum(after, 0) - np.maximum(before, 0)
+    short_delta = np.maximum(-after, 0) - np.maximum(-before, 0)
+
+    long_side = _match_side(np.maximum(long_delta, 0), np.maximum(-long_delta, 0))
+    short_side = _match_side(np.maximum(short_delta, 0), np.maximum(-short_delta, 0))
+
+    # Munches are produced in the order of the closing entries. Each
+    # entry closes at most one side, so a stable sort by the closer
+    # keeps the FIFO order of openers within each closer:
+    closer = np.concatenate([long_side[1], short_side[1]])
+    order = np.argsort(closer, kind='stable')
+    opener = np.concatenate([long_side[0], short_side[0]])[order]
+    matched = np.concatenate([long_side[2], -short_side[2]])[order]
+
+    # The final inventory lives on the side of the final balance:
+    balance = int(after[-1]) if len(after) else 0
+    if balance < 0:
+        lots, remaining = short_side[3], -short_side[4]
+    else:
+        lots, remaining = long_side[3], long_side[4]
+
+    return Matching(opener, closer[order], matched, lots, remaining, balance)
@@ -0,0 +1,167 @@
+"""
+Finds wash sales in the trace of a FIFO accounting.
+
+A sale at a loss is a wash sale when replacement shares are bought
+within 30 days before or after it. The loss is then disallowed, as far
+as replacement shares cover the shares sold, and added to the cost
+basis of the replacement shares instead. Replacement shares must be
+held after the sale, and each takes the loss of one share sold at most.
+
+Only long positions are considered: sales closing lots bought earlier,
+and purchases opening lots.
+"""
+
+import datetime
+from collections import deque
+from typing import Iterable, Iterator, NamedTuple
+
+from moneyed import Money
+
+from accfifo.fifo import FIFO
+from accfifo.lot import expand
+from accfifo.munch import Munch
+
+WINDOW = datetime.timedelta(days=30)
+
+
+class Purchase(object):
+    """
+    The shares bought by one tx: how many were closed so far while the
+    trace is replayed, and how many were taken as replacement shares.
+    """
+    __slots__ = ('tx', 'date', 'quantity', 'closed', 'used')
+
+    def __init__(self, tx: str, date: datetime.datetime, quantity):
+        self.tx = tx
+        self.date = date
+        self.quantity = quantity
+        self.closed = 0
+        self.used = 0
+
+    def available(self):
+        """
+        Returns how many shares are still held and not taken as
+        replacement shares yet. Shares taken are counted as the earliest
+        of the purchase, which are closed first.
+        """
+        return self.quantity - max(self.used, self.closed)
+
+
+class WashSale(NamedTuple):
+    """
+    The part of a loss munch washed by the shares of a replacement tx.
+    """
+    munch: Munch
+    quantity: int
+    disallowed: Money
+    replacement_tx: str
+    replacement_date: datetime.datetime
+
+
+def purchases(fifo: FIFO) -> list[Purchase]:
+    """
+    Returns the purchases of a FIFO accounting by tx, in date order.
+
+    These are put together out of the lots closed in the trace and the
+    lots still in the inventory.
+    """
+    by_tx: dict[str, Purchase] = {}
+    opened = [_in for (_in, _) in fifo.trace]
+    opened.extend(expand(fifo.inventory))
+    for entry in opened:
+        if entry.quantity <= 0:
+            continue
+        purchase = by_tx.get(entry.tx)
+        if purchase is None:
+            by_tx[entry.tx] = Purchase(entry.tx, entry.date, entry.quantity)
+        else:
+            purchase.quantity += entry.quantity
+    return sorted(by_tx.values(), key=lambda purchase: purchase.date)
+
+
+def _sales(trace: Iterable[Munch]) -> Iterator[list[Munch]]:
+    """
+    Groups the munches of the trace by the sale closing them, in order.
+    """
+    sale: list[Munch] = []
+    for munch in trace:
+        if sale and (munch[1].tx, munch[1].date) != (sale[-1][1].tx, sale[-1][1].date):
+            yield sale
+            sale = []
+        sale.append(munch)
+    if sale:
+        yield sale
+
+
+def find_wash_sales(fifo: FIFO, window: datetime.timedelta = WINDOW) -> list[WashSale]:
+    """
+    Finds the wash sales in the trace of the FIFO accounting.
+
+    The trace is replayed sale by sale, in order, while a sliding window
+    keeps the purchases within `window` of the current sale, so the cost
+    is about linear in the trace and the purchases. Replacement shares
+    are the shares of the window still held after the sale, other than
+    those of the lots the sale closes, and each is taken once at most,
+    from the earliest purchases first.
+    """
+    bought = purchases(fifo)
+    by_tx = {purchase.tx: purchase for purchase in bought}
+    result = []
+
+    # The purchases within the window of the current sale, in date order:
+    candidates: deque[Purchase] = deque()
+    upcoming = iter(bought)
+    pending = next(upcoming, None)
+    for sale in _sales(fifo.trace):
+        date = sale[0][1].date
+
+        # Close the lots of the sale first, so that they are not held:
+        sold = set()
+        for (_in, _) in sale:
+            if _in.quantity > 0:
+                by_tx[_in.tx].closed += _in.quantity
+                sold.add(_in.tx)
+
+        # Slide the window: take the purchases up to `window` after the
+        # sale and drop those earlier than `window` before it, or used
+        # up, as shares only ever get closed or taken:
+        while pending is not None and pending.date <= date + window:
+            candidates.append(pending)
+            pending = next(upcoming, None)
+        while candidates and (candidates[0].date < date - window or candidates[0].available() <= 0):
+            candidates.popleft()
+
+        # Wash as many of the shares sold at a loss as replacement
+        # shares cover:
+        for munch in sale:
+            if munch[0].quantity <= 0 or (munch.cb() + munch.proceeds()).amount <= 0:
+                continue
+            loss_per_share = (munch.cb() + munch.proceeds()) / munch.qty()
+            left = munch.qty()
+            for purchase in candidates:
+                if left == 0:
+                    break
+                available = purchase.available()
+                if available <= 0 or purchase.tx in sold:
+                    continue
+                quantity = min(left, available)
+                purchase.used += quantity
+                left -= quantity
+                result.append(WashSale(munch, quantity, loss_per_share * quantity, purchase.tx, purchase.date))
+
+    return result
+
+
+def basis_adjustments(wash_sales: Iterable[WashSale]) -> dict[str, Money]:
+    """
+    Returns the disallowed losses to be added to the cost basis of each
+    replacement tx.
+
+    This is a report only: the lots and the trace of the FIFO accounting
+    keep their prices, so its valuation and PnL are not adjusted.
+    """
+    adjustments: dict[str, Money] = {}
+    for wash_sale in wash_sales:
+        tx = wash_sale.replacement_tx
+        adjustments[tx] = adjustments.get(tx, 0) + wash_sale.disallowed
+    return adjustments
@@ -0,0 +1,130 @@
+"""
+Writes FIFO accountings as text in bulk, plain or as machine-readable
+munch records.
+"""
+
+import csv
+import json
+import sys
+from typing import Iterable
+
+from accfifo.fifo import FIFO
+from accfifo.munch import Munch
+from accfifo.tax_row import TaxRow
+
+# Lines, or records, buffered before each write:
+BUFFER_LINES = 4096
+
+RECORD_FORMATS = ('csv', 'tsv', 'jsonl')
+
+RECORD_FIELDS = (
+    'in_tx', 'in_qty', 'in_price', 'in_date',
+    'out_tx', 'out_qty', 'out_price', 'out_date',
+    'st', 'cb', 'proceeds', 'currency',
+)
+
+
+class PlainWriter(object):
+    """
+    Buffers lines of text and writes them to a file (stdout by default)
+    a few thousands at a time.
+    """
+
+    def __init__(self, file=None):
+        self.file = file if file is not None else sys.stdout
+        self._lines: list[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def write(self, line: str):
+        self._lines.append(line)
+        if len(self._lines) == BUFFER_LINES:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            self._lines.append('')
+            self.file.write('\n'.join(self._lines))
+            self._lines = []
+
+    def summary(self, fifo: FIFO, trace_length: int):
+        self.write(f"Available Stock          :  {fifo.stock}")
+        self.write(f"Stock Valuation          :  {fifo.valuation}")
+        self.write(f"Factored Average Cost    :  {fifo.avgcost}")
+        self.write(f"Factored Stock Valuation :  {fifo.valuation_factored}")
+        self.write(f"Average Cost             :  {fifo.avgcost_factored}")
+        self.write(f"Trace Length             :  {trace_length}")
+        self.write(f"Total Runtime            :  {fifo.runtime}")
+
+    def munches(self, munches: Iterable[Munch]):
+        for munch in munches:
+            self.write(str(munch))
+
+    def tax_rows(self, tax_rows: Iterable[TaxRow]):
+        for tax_row in tax_rows:
+            self.write(str(tax_row))
+
+
+def write_plain(fifo: FIFO, file=None):
+    """Write the summary, the trace and the tax rows of a FIFO accounting as plain text"""
+    with PlainWriter(file) as writer:
+        writer.summary(fifo, len(fifo.trace))
+        writer.munches(fifo.trace)
+        writer.tax_rows(fifo.group_as_tax_rows())
+
+
+def munch_record(munch: Munch) -> tuple:
+    """Return the values of a munch as in RECORD_FIELDS: amounts as decimal strings, dates in ISO format"""
+    (_in, _out) = munch
+    return (
+        _in.tx, _in.quantity, str(_in.price.amount), _in.date.isoformat() if _in.date else None,
+        _out.tx, _out.quantity, str(_out.price.amount), _out.date.isoformat() if _out.date else None,
+        munch.st(), str(munch.cb().amount), str(-munch.proceeds().amount), _in.price.currency.code,
+    )
+
+
+class RecordWriter(object):
+    """
+    Writes munches as records to a file (stdout by default) in bulk,
+    as .csv or .tsv rows with a header, or as JSON lines. Extra fields,
+    such as the key of a `Book`, lead each record. In JSON lines,
+    Decimal quantities are strings, as amounts are.
+    """
+
+    def __init__(self, file=None, format='csv', extra_fields=()):
+        if format not in RECORD_FORMATS:
+            raise ValueError(f'Unknown record format {format!r}, expected one of {RECORD_FORMATS}')
+        self.file = file if file is not None else sys.stdout
+        self.format = format
+        self.fields = tuple(extra_fields) + RECORD_FIELDS
+        self._records: list[tuple] = []
+        if format != 'jsonl':
+            self._csv = csv.writer(self.file, delimiter='\t' if format == 'tsv' else ',', lineterminator='\n')
+            self._csv.writerow(self.fields)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def write(self, munches: Iterable[Munch], extra=()):
+        extra = tuple(extra)
+        for munch in munches:
+            self._records.append(extra + munch_record(munch))
+            if len(self._records) == BUFFER_LINES:
+                self.flush()
+
+    def flush(self):
+        if not self._records:
+            return
+        if self.format == 'jsonl':
+            fields = self.fields
+            self.file.write(''.join(json.dumps(dict(zip(fields, record)), default=str) + '\n' for record in self._records))
+        else:
+            self._csv.writerows(self._records)
+        self._records = []
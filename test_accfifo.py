@@ -1,6 +1,102 @@
+import asyncio
+import contextlib
+import copy
+import csv
+import datetime
+import io
+import itertools
+import json
+import logging
+import os
+import pickle
+import random
+import tempfile
+import time
 import unittest
+import zlib
+from decimal import Decimal
+from unittest import mock
+
+import moneyed
+from click.testing import CliRunner
+from moneyed import Money
+
+from accfifo import FIFO, Book, Entry
+from accfifo.aio import Ingest
+from accfifo.checkpoint import load_checkpoint, save_checkpoint
+from accfifo.cli import cli, print_stream
+from accfifo.entry import RowParser
+from accfifo.l10n import format_money
+from accfifo.parallel import compute_parallel
+from accfifo.read_csv import iter_csv, iter_csv_parallel, read_book, read_csv, split_csv
+from accfifo.stats import Stats
+from accfifo.tax_row import trace_table
+from accfifo.trace_store import TraceStore
+from accfifo.wash_sale import basis_adjustments, find_wash_sales
+from accfifo.writer import RecordWriter, write_plain
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    from accfifo import arrow_io
+except ImportError:
+    pyarrow = None
+
+
+def make_entries(quantities_and_prices):
+    """
+    Builds dated, priced entries out of (quantity, price) pairs.
+    """
+    start = datetime.datetime(2020, 1, 1)
+    return [
+        Entry(f"t{i}", quantity, Money(price, "USD"), start + datetime.timedelta(days=i))
+        for i, (quantity, price) in enumerate(quantities_and_prices)
+    ]
+
+
+def munch_key(munch):
+    """
+    Returns a comparable representation of a munch.
+    """
+    return tuple((e.tx, e.quantity, e.price, e.date, e.factor) for e in munch)
+
+
+def random_trades(count, seed):
+    """
+    Generates (quantity, price) pairs with frequent position reversals.
+    """
+    rng = random.Random(seed)
+    return [(rng.choice([-1, 1]) * rng.randint(1, 100), rng.randint(1, 50)) for _ in range(count)]
 
-from accfifo import FIFO, Entry
+
+def write_csv(trades, date_format="%d-%b-%y", symbols=None):
+    """
+    Writes (quantity, price) pairs to a temporary .csv and returns its name.
+
+    Symbols, if given, are cycled through in a Symbol column.
+    """
+    start = datetime.datetime(2020, 1, 1)
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as csvfile:
+        csvfile.write("Tx,Qty,Cost,Date" + (",Symbol\n" if symbols else "\n"))
+        for i, (quantity, price) in enumerate(trades):
+            date = (start + datetime.timedelta(days=i)).strftime(date_format)
+            symbol = f",{symbols[i % len(symbols)]}" if symbols else ""
+            csvfile.write(f"t{i},{quantity},{price},{date}{symbol}\n")
+    return csvfile.name
+
+
+TRADES = [
+    (20, 10), (32, 7), (97, 6), (17, 2), (14, 1), (-50, 9), (-59, 6), (-50, 8), (63, 10), (-31, 6),
+    (-21, 1), (-36, 10), (-18, 2), (91, 2), (85, 4), (-81, 1), (33, 2), (45, 4), (-18, 4), (-33, 7),
+    (-47, 3), (-49, 7), (73, 3), (79, 10), (3, 5), (50, 7), (-82, 10), (47, 9), (72, 10), (-400, 8),
+]
 
 
 class TestFIFO(unittest.TestCase):
@@ -484,6 +580,1133 @@ class TestFIFO(unittest.TestCase):
         self.assertEqual(fifo.profit_and_loss, -788)
 
 
+class FIFOAssertions(object):
+    """
+    Compares FIFO accountings, mixed into test cases.
+    """
+
+    def assertSameFIFO(self, fifo, expected):
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in expected.trace])
+        self.assertEqual([(e.tx, e.quantity) for e in fifo.inventory], [(e.tx, e.quantity) for e in expected.inventory])
+        self.assertEqual(fifo.stock, expected.stock)
+        self.assertEqual(fifo.aggregates, expected.aggregates)
+
+
+class TestIncrementalFIFO(FIFOAssertions, unittest.TestCase):
+    """
+    Tests feeding entries into an existing FIFO accounting.
+    """
+
+    def test_add_one_by_one(self):
+        fifo = FIFO()
+        for entry in make_entries(TRADES):
+            fifo.add(entry)
+        self.assertSameFIFO(fifo, FIFO(make_entries(TRADES)))
+
+    def test_extend_in_chunks(self):
+        entries = make_entries(TRADES)
+        fifo = FIFO(entries[:7])
+        fifo.extend(entries[7:19])
+        fifo.extend(iter(entries[19:]))
+        self.assertSameFIFO(fifo, FIFO(make_entries(TRADES)))
+
+
+class TestRunningAggregates(unittest.TestCase):
+    """
+    Tests the running valuation and PnL aggregates.
+    """
+
+    def test_consistency_check(self):
+        fifo = FIFO(check=True)
+        for entry in make_entries(TRADES):
+            fifo.add(entry)
+        self.assertEqual(fifo.stock, -154)
+        self.assertEqual(fifo.valuation, Money(-1232, "USD"))
+        self.assertEqual(fifo.avgcost, Money(8, "USD"))
+
+    def test_matches_recompute(self):
+        fifo = FIFO(make_entries(TRADES))
+        self.assertEqual(
+            (fifo.valuation, fifo.valuation_factored, fifo.profit_and_loss, fifo.profit_and_loss_factored),
+            fifo._aggregates(),
+        )
+
+    def test_empty_inventory_is_zero(self):
+        fifo = FIFO(make_entries([(100, 10), (-100, 12)]), check=True)
+        self.assertEqual(fifo.valuation, 0)
+        self.assertIsNone(fifo.avgcost)
+        self.assertEqual(fifo.profit_and_loss, Money(-200, "USD"))
+
+    def test_check_raises_on_mismatch(self):
+        fifo = FIFO(make_entries([(100, 10)]), check=True)
+        fifo._valuation += 1
+        with self.assertRaisesRegex(AssertionError, "differ from recomputed"):
+            fifo.add(make_entries([(10, 10)])[0])
+
+    def test_factors_and_prices(self):
+        entries = [
+            Entry("a", 3, Money("1.25", "USD"), factor=Decimal("0.5")),
+            Entry("b", 2, Money("2.5", "USD"), factor=2.5),
+            Entry("c", -4, Money("3", "USD"), factor=3),
+        ]
+        fifo = FIFO(entries)
+        self.assertEqual(fifo.valuation_factored, Money("6.25", "USD"))
+        self.assertEqual(fifo.profit_and_loss_factored, Money("-27.875", "USD"))
+        self.assertEqual(FIFO([Entry("a", 2, 10), Entry("b", -1, 12)], check=True).profit_and_loss, -2)
+        with self.assertRaises(TypeError):
+            FIFO([Entry("a", 1, Money(1, "USD")), Entry("b", 1, Money(1, "EUR"))])
+
+    def test_long_runs(self):
+        trades = [(1, 10 + i % 7) for i in range(2500)] + [(-3000, 20)] + [(-1, 15)] * 1500
+        stats = Stats()
+        fifo = FIFO(make_entries(trades), check=True, stats=stats)
+        self.assertEqual(fifo.stock, -2000)
+        self.assertEqual(fifo.valuation, Money(-500 * 20 - 1500 * 15, "USD"))
+        self.assertEqual(stats.pushes, 4000)
+        self.assertEqual(stats.max_depth, 2500)
+
+    def test_failing_entries_keep_run(self):
+        def entries():
+            yield from make_entries([(10, 1), (5, 2)])
+            raise RuntimeError("Cannot convert row")
+
+        fifo = FIFO()
+        with self.assertRaises(RuntimeError):
+            fifo.extend(entries())
+        self.assertEqual(fifo.stock, 15)
+        self.assertEqual(fifo.valuation, Money(20, "USD"))
+        self.assertEqual([e.tx for e in fifo.inventory], ["t0", "t1"])
+
+
+class TestCompactEntries(unittest.TestCase):
+    """
+    Tests the compact representation of entries and munches.
+    """
+
+    def test_no_instance_dicts(self):
+        fifo = FIFO(make_entries([(100, 10), (-40, 12)]))
+        (munch,) = fifo.trace
+        self.assertFalse(hasattr(munch, "__dict__"))
+        self.assertFalse(any(hasattr(e, "__dict__") for e in munch))
+
+    def test_copy_keeps_data(self):
+        entry = Entry("t1", 100, Money(10, "USD"), symbol="ABC")
+        copied = entry.copy(-40)
+        self.assertEqual(copied.quantity, -40)
+        self.assertEqual(copied.data, {"symbol": "ABC"})
+        copied.data["symbol"] = "XYZ"
+        self.assertEqual(entry.data, {"symbol": "ABC"})
+        self.assertEqual(Entry("t2", 1, Money(1, "USD")).copy().data, {})
+
+    def test_data_is_mutable(self):
+        entry = Entry("t1", 100, Money(10, "USD"))
+        entry.data["symbol"] = "ABC"
+        self.assertEqual(entry.copy().data, {"symbol": "ABC"})
+        self.assertEqual(Entry("t2", 1, Money(1, "USD")).data, {})
+
+    def test_pickle_round_trip(self):
+        fifo = FIFO(make_entries(TRADES))
+        fifo.inventory[0].data["symbol"] = "ABC"
+        for restored in (pickle.loads(pickle.dumps(fifo)), copy.deepcopy(fifo)):
+            self.assertEqual([munch_key(m) for m in restored.trace], [munch_key(m) for m in fifo.trace])
+            self.assertEqual([(e.tx, e.quantity, e.data) for e in restored.inventory],
+                             [(e.tx, e.quantity, e.data) for e in fifo.inventory])
+            self.assertEqual((restored.stock, restored.valuation), (fifo.stock, fifo.valuation))
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestNumpyEngine(unittest.TestCase):
+    """
+    Tests that the vectorized engine matches the Python engine.
+    """
+
+    def assertSameAsPython(self, trades):
+        fifo = FIFO(make_entries(trades), engine="numpy")
+        expected = FIFO(make_entries(trades))
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in expected.trace])
+        self.assertEqual([(e.tx, e.quantity) for e in fifo.inventory], [(e.tx, e.quantity) for e in expected.inventory])
+        self.assertEqual(fifo.stock, expected.stock)
+        self.assertEqual(
+            (fifo.valuation, fifo.profit_and_loss, fifo.avgcost),
+            (expected.valuation, expected.profit_and_loss, expected.avgcost),
+        )
+
+    def test_no_entries(self):
+        self.assertSameAsPython([])
+
+    def test_trades(self):
+        self.assertSameAsPython(TRADES)
+
+    def test_random_reversals(self):
+        for seed in range(20):
+            self.assertSameAsPython(random_trades(200, seed))
+
+    def test_flat_at_end(self):
+        self.assertSameAsPython([(100, 10), (-30, 11), (-170, 12), (100, 9)])
+
+    def test_add_after_numpy(self):
+        entries = make_entries(TRADES)
+        fifo = FIFO(entries[:20], engine="numpy", check=True)
+        fifo.extend(entries[20:])
+        expected = FIFO(make_entries(TRADES))
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in expected.trace])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            FIFO(engine="fortran")
+
+
+class TestReadCSV(unittest.TestCase):
+    """
+    Tests reading entries from a .csv.
+    """
+
+    def setUp(self):
+        self.filename = write_csv(TRADES)
+        self.addCleanup(os.remove, self.filename)
+
+    def test_read_csv(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            fifo = read_csv(logging.getLogger(__name__), self.filename)
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in FIFO(make_entries(TRADES)).trace])
+
+    def test_iter_csv_is_lazy(self):
+        entries = iter_csv(None, self.filename)
+        self.assertEqual(next(entries).tx, "t0")
+        self.assertEqual(len(list(entries)), len(TRADES) - 1)
+
+    def test_log_rows(self):
+        log = logging.getLogger(__name__)
+        with self.assertNoLogs(log, logging.DEBUG):
+            read_csv(log, self.filename)
+        with self.assertLogs(log, logging.DEBUG) as logged:
+            read_csv(log, self.filename, log_rows=True)
+        self.assertEqual(len(logged.records), len(TRADES))
+
+    def test_split_csv(self):
+        header, ranges = split_csv(self.filename, 7)
+        self.assertEqual(header, ["Tx", "Qty", "Cost", "Date"])
+        with open(self.filename, "rb") as csvfile:
+            content = csvfile.read()
+        self.assertEqual(b"".join(content[start:end] for (start, end) in ranges), content[content.index(b"\n") + 1:])
+        self.assertTrue(all(content[end - 1:end] == b"\n" for (_, end) in ranges))
+
+    def test_iter_csv_parallel(self):
+        filename = write_csv(TRADES, symbols="AB")
+        self.addCleanup(os.remove, filename)
+        parsed = list(iter_csv_parallel(None, filename, jobs=3, columns=("Symbol",)))
+        expected = list(iter_csv(None, filename, columns=("Symbol",)))
+        self.assertEqual(
+            [(e.tx, e.quantity, e.price, e.date, e.data) for e in parsed],
+            [(e.tx, e.quantity, e.price, e.date, e.data) for e in expected],
+        )
+        fifo = read_csv(None, self.filename, jobs=2)
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in FIFO(make_entries(TRADES)).trace])
+
+    @mock.patch("accfifo.read_csv.CHUNK_BYTES", 64)
+    def test_iter_csv_parallel_window(self):
+        parsed = iter_csv_parallel(None, self.filename, jobs=2)
+        self.assertEqual(
+            [(e.tx, e.quantity, e.price, e.date) for e in parsed],
+            [(e.tx, e.quantity, e.price, e.date) for e in make_entries(TRADES)],
+        )
+        with self.assertRaises(ValueError):
+            read_csv(None, self.filename, log_rows=True, jobs=2)
+
+
+class TestRowParser(unittest.TestCase):
+    """
+    Tests the caching .csv row parser.
+    """
+
+    def test_matches_from_row(self):
+        parser = RowParser()
+        for date in ("05-Mar-21", "05-Mar-2021", "06-Mar-21"):
+            row = {"Tx": "1", "Qty": "-10", "Cost": "12.5", "Date": date}
+            expected = Entry.from_row(row)
+            parsed = parser.entry(row)
+            self.assertEqual(
+                (parsed.tx, parsed.quantity, parsed.price, parsed.date),
+                (expected.tx, expected.quantity, expected.price, expected.date),
+            )
+
+    def test_detects_format_once(self):
+        parser = RowParser()
+        parser.date("05-Mar-2021")
+        self.assertEqual(parser.date_format, "%d-%b-%Y")
+        self.assertIs(parser.date("05-Mar-2021"), parser.date("05-Mar-2021"))
+        self.assertIs(parser.cost("1.25"), parser.cost("1.25"))
+
+    @mock.patch("accfifo.entry.CACHE_SIZE", 4)
+    def test_bounded_caches(self):
+        parser = RowParser()
+        for day in range(1, 29):
+            self.assertEqual(parser.date(f"{day:02}-Mar-2021").day, day)
+            self.assertEqual(parser.cost(f"{day}.5"), Money(f"{day}.5", "USD"))
+        self.assertEqual((parser.date.cache_info().currsize, parser.cost.cache_info().currsize), (4, 4))
+
+    def test_invalid_values(self):
+        parser = RowParser()
+        with self.assertRaises(RuntimeError):
+            parser.cost("n/a")
+        with self.assertRaises(ValueError):
+            parser.date("2021-03-05")
+
+
+class TestBook(unittest.TestCase):
+    """
+    Tests keeping one FIFO accounting per key.
+    """
+
+    def setUp(self):
+        self.entries = make_entries(TRADES)
+        for i, entry in enumerate(self.entries):
+            entry.data["symbol"] = "AB"[i % 2]
+
+    def test_routes_by_data(self):
+        book = Book("symbol", self.entries)
+        self.assertEqual(list(book), ["A", "B"])
+        for i, symbol in enumerate("AB"):
+            expected = FIFO(make_entries(TRADES)[i::2])
+            self.assertEqual([munch_key(m) for m in book[symbol].trace], [munch_key(m) for m in expected.trace])
+            self.assertEqual(book[symbol].stock, expected.stock)
+        self.assertEqual(book.stock, sum(q for q, _ in TRADES))
+        self.assertEqual(book.valuation, book["A"].valuation + book["B"].valuation)
+        self.assertEqual(
+            [row.tx for row in book.group_as_tax_rows()],
+            [row.tx for row in book["A"].group_as_tax_rows()] + [row.tx for row in book["B"].group_as_tax_rows()],
+        )
+
+    def test_callable_key_and_lazy_keys(self):
+        book = Book(lambda entry: entry.data["symbol"])
+        self.assertEqual(len(book), 0)
+        book.add(self.entries[0])
+        self.assertEqual(list(book), ["A"])
+
+    def test_read_book(self):
+        filename = write_csv(TRADES, symbols="AB")
+        self.addCleanup(os.remove, filename)
+        book = read_book(None, filename, "Symbol")
+        self.assertEqual(list(book), ["A", "B"])
+        self.assertEqual(book["B"].stock, sum(q for q, _ in TRADES[1::2]))
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Tests computing the FIFO accountings of keys in parallel.
+    """
+
+    def test_pack_round_trip(self):
+        entry = Entry("t1", -5, Money("1.25", "EUR"), datetime.datetime(2021, 3, 5), factor=2, symbol="ABC")
+        unpacked = Entry.unpack(entry.pack())
+        self.assertEqual(
+            (unpacked.tx, unpacked.quantity, unpacked.price, unpacked.date, unpacked.factor, unpacked.data),
+            (entry.tx, entry.quantity, entry.price, entry.date, entry.factor, entry.data),
+        )
+
+    def test_same_as_book(self):
+        trades = random_trades(300, 7)
+        entries = make_entries(trades)
+        for i, entry in enumerate(entries):
+            entry.data["symbol"] = "ABCDE"[i * 7 % 5]
+        expected = Book("symbol", [e.copy() for e in entries])
+        book = compute_parallel(entries, "symbol", jobs=2, check=True)
+        self.assertEqual(list(book), list(expected))
+        for symbol in book:
+            self.assertEqual([munch_key(m) for m in book[symbol].trace], [munch_key(m) for m in expected[symbol].trace])
+            self.assertEqual([(e.tx, e.quantity) for e in book[symbol].inventory],
+                             [(e.tx, e.quantity) for e in expected[symbol].inventory])
+        self.assertEqual((book.stock, book.valuation, book.profit_and_loss),
+                         (expected.stock, expected.valuation, expected.profit_and_loss))
+
+
+class TestCheckpoint(unittest.TestCase):
+    """
+    Tests saving and resuming the FIFO accounting state.
+    """
+
+    def setUp(self):
+        (handle, self.filename) = tempfile.mkstemp(suffix=".ckpt")
+        os.close(handle)
+        self.addCleanup(os.remove, self.filename)
+
+    def resume(self, include_trace, **options):
+        trades = random_trades(400, 3)
+        entries = make_entries(trades)
+        save_checkpoint(FIFO(entries[:250]), self.filename, include_trace=include_trace)
+        fifo = load_checkpoint(self.filename, **options)
+        fifo.extend(entries[250:])
+        return fifo, FIFO(make_entries(trades))
+
+    def test_resume_with_trace(self):
+        (fifo, expected) = self.resume(True, check=True)
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in expected.trace])
+        self.assertEqual(fifo.aggregates, expected.aggregates)
+
+    def test_resume_without_trace(self):
+        (fifo, expected) = self.resume(False)
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in expected.trace[-len(fifo.trace):]])
+        self.assertEqual([(e.tx, e.quantity, e.price) for e in fifo.inventory],
+                         [(e.tx, e.quantity, e.price) for e in expected.inventory])
+        self.assertEqual((fifo.stock, fifo.aggregates), (expected.stock, expected.aggregates))
+
+    def test_explicit_layout(self):
+        entries = [
+            Entry("t0", Decimal("1.5"), Money("10.25", "EUR"), None, factor=Decimal("0.5"), symbol="ABC"),
+            Entry("t1", 2, Money(11, "EUR"), datetime.datetime(2020, 1, 2, 9, 30), factor=2),
+        ]
+        save_checkpoint(FIFO(entries), self.filename)
+        with open(self.filename, "rb") as file:
+            file.seek(10)
+            state = json.loads(zlib.decompress(file.read()))
+        self.assertEqual(state["inventory"][0], ["t0", "1.5", ["10.25", "EUR"], None, "0.5", {"symbol": "ABC"}])
+        fifo = load_checkpoint(self.filename)
+        self.assertEqual(
+            [(e.tx, e.quantity, e.price, e.date, e.factor, e.data) for e in fifo.inventory],
+            [(e.tx, e.quantity, e.price, e.date, e.factor, e.data) for e in entries],
+        )
+        self.assertEqual((fifo.stock, fifo.aggregates), (Decimal("3.5"), FIFO(entries).aggregates))
+
+    def test_version_mismatch(self):
+        save_checkpoint(FIFO(), self.filename)
+        with open(self.filename, "r+b") as file:
+            file.seek(8)
+            file.write(b"\xff\xff")
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.filename)
+
+
+class TestTraceStore(unittest.TestCase):
+    """
+    Tests keeping the trace in a memory-mapped file.
+    """
+
+    def setUp(self):
+        (handle, self.filename) = tempfile.mkstemp(suffix=".trace")
+        os.close(handle)
+        self.addCleanup(os.remove, self.filename)
+
+    def test_same_as_list(self):
+        trades = random_trades(300, 11)
+        expected = FIFO(make_entries(trades))
+        with TraceStore(self.filename) as store:
+            fifo = FIFO(make_entries(trades), trace=store, check=True)
+            self.assertIs(fifo.trace, store)
+            self.assertEqual(len(store), len(expected.trace))
+            self.assertEqual([munch_key(m) for m in store], [munch_key(m) for m in expected.trace])
+            self.assertEqual(munch_key(store[-1]), munch_key(expected.trace[-1]))
+            self.assertEqual(fifo.profit_and_loss, expected.profit_and_loss)
+            self.assertEqual(
+                [(row.tx, row.st, row.qty(), row.cb(), row.proceeds()) for row in fifo.group_as_tax_rows()],
+                [(row.tx, row.st, row.qty(), row.cb(), row.proceeds()) for row in expected.group_as_tax_rows()],
+            )
+            self.assertEqual(trace_table(store).row_count, len(expected.trace))
+        with TraceStore(self.filename, reset=False) as store:
+            self.assertEqual([munch_key(m) for m in store], [munch_key(m) for m in expected.trace])
+
+    def test_invalid_records(self):
+        with TraceStore(self.filename, tx_width=1) as store:
+            with self.assertRaises(ValueError):
+                FIFO(make_entries([(10, 1), (-10, 2)]), trace=store)
+            munch = FIFO([Entry("a", 1, Money(1, "EUR")), Entry("b", -1, Money(1, "EUR"))]).trace[0]
+            with self.assertRaises(ValueError):
+                store.append(munch)
+            with self.assertRaises(IndexError):
+                store[0]
+
+    def test_quantities(self):
+        entries = [Entry("a", Decimal("10"), Money(1, "USD")), Entry("b", Decimal("-4"), Money(2, "USD"))]
+        with TraceStore(self.filename) as store:
+            FIFO(entries, trace=store)
+            self.assertEqual([(m[0].quantity, m[1].quantity) for m in store], [(4, -4)])
+            munch = FIFO([Entry("a", 2, Money(1, "USD")), Entry("b", Decimal("-1.5"), Money(1, "USD"))]).trace[0]
+            with self.assertRaisesRegex(ValueError, "fractional"):
+                store.append(munch)
+            self.assertEqual(len(store), 1)
+
+
+class TestMinorUnits(unittest.TestCase):
+    """
+    Tests that the minor units arithmetic gives the same results as Money.
+    """
+
+    def assertSameResults(self, make, **options):
+        fifo = FIFO(make(), numeric="minor", check=True, **options)
+        expected = FIFO(make(), **options)
+        self.assertEqual(fifo.stock, expected.stock)
+        for name in ("valuation", "valuation_factored", "profit_and_loss", "profit_and_loss_factored",
+                     "avgcost", "avgcost_factored"):
+            self.assertEqual(getattr(fifo, name), getattr(expected, name), name)
+            self.assertIs(type(getattr(fifo, name)), type(getattr(expected, name)), name)
+        self.assertEqual(
+            [(row.tx, row.st, row.qty(), row.cb(), row.proceeds()) for row in fifo.group_as_tax_rows()],
+            [(row.tx, row.st, row.qty(), row.cb(), row.proceeds()) for row in expected.group_as_tax_rows()],
+        )
+
+    def test_no_entries(self):
+        self.assertSameResults(list)
+
+    def test_trades(self):
+        self.assertSameResults(lambda: make_entries(TRADES))
+
+    def test_flat(self):
+        self.assertSameResults(lambda: make_entries([(100, 10), (-100, 12)]))
+
+    def test_sub_cent_prices_and_factors(self):
+        rng = random.Random(5)
+
+        def make():
+            entries = make_entries((q, f"{p}.{rng.randint(0, 9999):04}") for (q, p) in random_trades(300, 5))
+            for entry in entries:
+                entry.factor = rng.choice([1, 2, 100])
+            return entries
+
+        for _ in range(5):
+            state = rng.getstate()
+            fifo = FIFO(make(), numeric="minor", check=True)
+            rng.setstate(state)
+            expected = FIFO(make())
+            self.assertEqual(fifo.aggregates, expected.aggregates)
+            self.assertEqual((fifo.avgcost, fifo.avgcost_factored), (expected.avgcost, expected.avgcost_factored))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_engine(self):
+        self.assertSameResults(lambda: make_entries(random_trades(300, 9)), engine="numpy")
+
+    def test_checkpoint_across_modes(self):
+        (handle, filename) = tempfile.mkstemp(suffix=".ckpt")
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        entries = make_entries(TRADES)
+        save_checkpoint(FIFO(entries[:15], numeric="minor"), filename)
+        fifo = load_checkpoint(filename)
+        fifo.extend(entries[15:])
+        self.assertEqual(fifo.aggregates, FIFO(make_entries(TRADES)).aggregates)
+
+    def test_unrepresentable_price(self):
+        with self.assertRaises(ValueError):
+            FIFO([Entry("a", 1, Money("0.0000001", "USD"))], numeric="minor")
+        with self.assertRaises(ValueError):
+            FIFO([Entry("a", 1, Money(1, "USD")), Entry("b", 1, Money(1, "EUR"))], numeric="minor")
+
+
+class TestTaxRows(unittest.TestCase):
+    """
+    Tests the running totals and the caching of tax rows.
+    """
+
+    def test_running_totals(self):
+        fifo = FIFO(make_entries(random_trades(300, 13)))
+        for row in fifo.group_as_tax_rows():
+            self.assertEqual(row.qty(), sum([m.qty() for m in row.lots]))
+            self.assertEqual(row.cb(), sum([m.cb() for m in row.lots]))
+            self.assertEqual(row.proceeds(), -sum([m.proceeds() for m in row.lots]))
+
+    def test_cached_until_trace_changes(self):
+        entries = make_entries(TRADES)
+        fifo = FIFO(entries[:20])
+        rows = list(fifo.group_as_tax_rows())
+        self.assertEqual([id(row) for row in fifo.group_as_tax_rows()], [id(row) for row in rows])
+        fifo.extend(entries[20:])
+        self.assertEqual(
+            [(row.tx, row.qty(), row.cb()) for row in fifo.group_as_tax_rows()],
+            [(row.tx, row.qty(), row.cb()) for row in FIFO(make_entries(TRADES)).group_as_tax_rows()],
+        )
+
+    def test_trace_appended_directly(self):
+        fifo = FIFO(make_entries([(10, 1), (-4, 2)]))
+        self.assertEqual(len(list(fifo.group_as_tax_rows())), 1)
+        fifo.trace.extend(FIFO(make_entries([(10, 1), (0, 1), (-3, 2)])).trace)
+        self.assertEqual([row.qty() for row in fifo.group_as_tax_rows()], [4, 3])
+
+    def test_not_cached_out_of_core(self):
+        (handle, filename) = tempfile.mkstemp(suffix=".trace")
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        with TraceStore(filename) as store:
+            fifo = FIFO(make_entries(TRADES), trace=store)
+            rows = [(row.tx, row.qty(), row.cb()) for row in fifo.group_as_tax_rows()]
+            self.assertIsNone(fifo._tax_rows)
+            expected = FIFO(make_entries(TRADES))
+            self.assertEqual(rows, [(row.tx, row.qty(), row.cb()) for row in expected.group_as_tax_rows()])
+
+
+class TestStats(unittest.TestCase):
+    """
+    Tests the engine counters and timers.
+    """
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(FIFO(make_entries(TRADES)).stats)
+
+    def test_counters(self):
+        stats = Stats()
+        fifo = FIFO(make_entries([(60, 10), (40, 11), (-30, 12), (-100, 12), (10, 9)]), stats=stats)
+        self.assertIs(fifo.stats, stats)
+        self.assertEqual(
+            {name: value for name, value in stats.as_dict().items() if not isinstance(value, float)},
+            {"entries": 5, "pushes": 2, "fills": 3, "full": 2, "partial": 2, "reversals": 1, "max_depth": 2},
+        )
+
+    def test_timers(self):
+        filename = write_csv(TRADES, symbols="AB")
+        self.addCleanup(os.remove, filename)
+        stats = Stats()
+        list(read_book(None, filename, "Symbol", stats=stats).group_as_tax_rows())
+        self.assertEqual(stats.entries, len(TRADES))
+        self.assertGreater(stats.parsing, 0)
+        self.assertGreater(stats.matching, 0)
+        self.assertGreater(stats.grouping, 0)
+
+    def test_parallel(self):
+        entries = make_entries(TRADES)
+        for i, entry in enumerate(entries):
+            entry.data["symbol"] = "AB"[i % 2]
+        stats = Stats()
+        compute_parallel(entries, "symbol", jobs=2, stats=stats)
+        self.assertEqual(stats.entries, len(TRADES))
+
+
+class TestCoalescing(unittest.TestCase):
+    """
+    Tests merging alike inventory lots.
+    """
+
+    def make_entries(self, count, seed):
+        """
+        Builds entries of few distinct prices and dates, in runs.
+        """
+        rng = random.Random(seed)
+        start = datetime.datetime(2020, 1, 1)
+        entries = []
+        for i in range(count):
+            quantity = rng.randint(1, 20) * (-1 if (i // 25) % 3 == 2 else 1)
+            date = start + datetime.timedelta(days=i // 10)
+            entries.append(Entry(f"t{i}", quantity, Money(rng.choice([5, 6]), "USD"), date))
+        return entries
+
+    def test_same_as_plain(self):
+        for numeric in ("money", "minor"):
+            plain = FIFO(self.make_entries(600, 1), numeric=numeric)
+            coalesced = FIFO(self.make_entries(600, 1), check=True, numeric=numeric, coalesce=True)
+            self.assertEqual([munch_key(m) for m in coalesced.trace], [munch_key(m) for m in plain.trace])
+            self.assertEqual(coalesced.aggregates, plain.aggregates)
+            self.assertEqual(coalesced.stock, plain.stock)
+            self.assertLess(len(coalesced.inventory), len(plain.inventory))
+
+    def test_large_sell(self):
+        date = datetime.datetime(2020, 1, 1)
+        entries = [Entry(f"b{i}", 1, Money(10, "USD"), date) for i in range(1000)]
+        fifo = FIFO(entries, check=True, coalesce=True)
+        self.assertEqual(len(fifo.inventory), 1)
+        stats = Stats()
+        fifo.stats = stats
+        fifo.add(Entry("s", -600, Money(12, "USD"), date))
+        self.assertEqual((stats.full, stats.partial), (0, 1))
+        self.assertEqual(len(fifo.trace), 600)
+        self.assertEqual([m[0].tx for m in fifo.trace[:2]], ["b0", "b1"])
+        self.assertEqual(fifo.trace[-1][1].quantity, -1)
+        self.assertEqual(fifo.stock, 400)
+        self.assertEqual(fifo.profit_and_loss, Money(-1200, "USD"))
+
+    def test_checkpoint(self):
+        date = datetime.datetime(2020, 1, 1)
+        fifo = FIFO([Entry(f"b{i}", 2, Money(10, "USD"), date) for i in range(5)], coalesce=True)
+        fifo.add(Entry("s", -3, Money(12, "USD"), date))
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "fifo.ckpt")
+            save_checkpoint(fifo, filename)
+            restored = load_checkpoint(filename)
+        self.assertEqual([(e.tx, e.quantity) for e in restored.inventory], [("b1", 1), ("b2", 2), ("b3", 2), ("b4", 2)])
+
+
+class TestRelief(unittest.TestCase):
+    """
+    Tests the relief methods other than first-in-first-out.
+    """
+
+    def relieve(self, trades, relief, **options):
+        fifo = FIFO(make_entries(trades), check=True, relief=relief, **options)
+        return (
+            [(m[0].tx, m[0].quantity) for m in fifo.trace],
+            [(e.tx, e.quantity) for e in fifo.inventory],
+        )
+
+    def test_lifo(self):
+        self.assertEqual(
+            self.relieve([(10, 5), (10, 7), (10, 6), (-15, 8)], "lifo"),
+            ([("t2", 10), ("t1", 5)], [("t0", 10), ("t1", 5)]),
+        )
+
+    def test_hifo(self):
+        for numeric in ("money", "minor"):
+            self.assertEqual(
+                self.relieve([(10, 5), (10, 7), (10, 6), (-15, 8)], "hifo", numeric=numeric),
+                ([("t1", 10), ("t2", 5)], [("t0", 10), ("t2", 5)]),
+            )
+        self.assertEqual(
+            self.relieve([(-10, 5), (-10, 7), (-10, 5), (15, 6)], "hifo"),
+            ([("t0", -10), ("t2", -5)], [("t1", -10), ("t2", -5)]),
+        )
+
+    def test_specific(self):
+        entries = make_entries([(10, 5), (10, 7), (10, 6)])
+        entries.append(Entry("s0", -15, Money(8, "USD"), datetime.datetime(2020, 2, 1), lot=["t2", "t0"]))
+        entries.append(Entry("s1", -10, Money(8, "USD"), datetime.datetime(2020, 2, 2)))
+        entries.append(Entry("s2", -2, Money(8, "USD"), datetime.datetime(2020, 2, 3), lot="t0"))
+        fifo = FIFO(entries, check=True, relief="specific")
+        self.assertEqual(
+            [(m[0].tx, m[0].quantity, m[1].tx) for m in fifo.trace],
+            [("t2", 10, "s0"), ("t0", 5, "s0"), ("t0", 5, "s1"), ("t1", 5, "s1"), ("t1", 2, "s2")],
+        )
+        self.assertEqual([(e.tx, e.quantity) for e in fifo.inventory], [("t1", 3)])
+        self.assertEqual(list(fifo.inventory._index), ["t1"])
+
+    def test_specific_duplicate_tx(self):
+        fifo = FIFO(make_entries([(10, 5), (-10, 6)]), relief="specific")
+        fifo.add(Entry("t0", 5, Money(5, "USD"), datetime.datetime(2020, 2, 1)))
+        with self.assertRaisesRegex(ValueError, "open already"):
+            fifo.add(Entry("t0", 5, Money(5, "USD"), datetime.datetime(2020, 2, 2)))
+
+    def test_hifo_order(self):
+        trades = [(10, i * 7 % 13) for i in range(50)] + [(-95, 8), (-7, 8)]
+        fifo = FIFO(make_entries(trades), check=True, relief="hifo")
+        open_lots = [(e.tx, e.quantity) for e in fifo.inventory]
+        self.assertEqual(open_lots, sorted(open_lots, key=lambda lot: int(lot[0][1:])))
+        self.assertEqual(sum(q for (_, q) in open_lots), 500 - 102)
+        self.assertEqual(sorted(e.price.amount for e in fifo.inventory)[-2:], [9, 10])
+
+    def test_reversal(self):
+        self.assertEqual(
+            self.relieve([(10, 5), (10, 7), (-30, 8), (5, 6)], "lifo"),
+            ([("t1", 10), ("t0", 10), ("t2", -5)], [("t2", -5)]),
+        )
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            FIFO(relief="random")
+        with self.assertRaises(ValueError):
+            FIFO(relief="lifo", coalesce=True)
+
+
+class TestSortedIngestion(FIFOAssertions, unittest.TestCase):
+    """
+    Tests sorting entries and inserting backdated entries.
+    """
+
+    def test_sorts_unordered_entries(self):
+        entries = make_entries(random_trades(200, 3))
+        random.Random(3).shuffle(entries)
+        fifo = FIFO(entries, check=True, sort=True)
+        self.assertSameFIFO(fifo, FIFO(make_entries(random_trades(200, 3))))
+
+    @mock.patch("accfifo.fifo.CHECKPOINT_INTERVAL", 16)
+    def test_insert_backdated(self):
+        for options in ({}, {"numeric": "minor"}, {"relief": "hifo"}, {"coalesce": True}):
+            entries = make_entries(random_trades(300, 4))
+            late = entries[40::7]
+            fifo = FIFO([e for e in entries if e not in late], sort=True, **options)
+            for entry in reversed(late):
+                fifo.insert(entry)
+            self.assertSameFIFO(fifo, FIFO(make_entries(random_trades(300, 4)), **options))
+
+    def test_insert_requires_sort(self):
+        with self.assertRaises(ValueError):
+            FIFO().insert(make_entries([(1, 1)])[0])
+
+    def test_requires_list_trace(self):
+        (handle, filename) = tempfile.mkstemp(suffix=".trace")
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        with TraceStore(filename) as store:
+            with self.assertRaisesRegex(ValueError, "list trace"):
+                FIFO(trace=store, sort=True)
+
+    def test_resumed(self):
+        entries = make_entries(random_trades(60, 5))
+        state = FIFO(entries[:40])
+        arguments = (list(state.inventory), state.stock, list(state.trace), state.aggregates)
+        fifo = FIFO.from_state(*arguments, state.date, sort=True)
+        fifo.extend(reversed(entries[40:]))
+        self.assertEqual(fifo.date, entries[-1].date)
+        with self.assertRaisesRegex(ValueError, "before the state"):
+            fifo.insert(make_entries(random_trades(60, 5))[38])
+        self.assertSameFIFO(fifo, FIFO(make_entries(random_trades(60, 5))))
+        with self.assertRaises(ValueError):
+            FIFO.from_state(*arguments, sort=True)
+
+
+class TestHistory(unittest.TestCase):
+    """
+    Tests point-in-time queries.
+    """
+
+    def test_as_of(self):
+        trades = random_trades(400, 5)
+        for options in ({}, {"numeric": "minor"}):
+            fifo = FIFO(make_entries(trades), history=True, **options)
+            for days in (0, 1, 57, 123, 250, 399):
+                date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=days, hours=12)
+                expected = FIFO(make_entries(trades[:days + 1]), **options)
+                self.assertEqual(fifo.as_of(date), (expected.stock, expected.valuation, expected.avgcost))
+            self.assertEqual(fifo.as_of(datetime.datetime(2019, 1, 1)), (0, 0, None))
+
+    @mock.patch("accfifo.fifo.CHECKPOINT_INTERVAL", 16)
+    def test_as_of_after_insert(self):
+        entries = make_entries(random_trades(100, 6))
+        fifo = FIFO(entries[:30] + entries[31:], sort=True, history=True)
+        fifo.insert(entries[30])
+        date = entries[60].date
+        expected = FIFO(make_entries(random_trades(100, 6))[:61])
+        self.assertEqual(fifo.as_of(date), (expected.stock, expected.valuation, expected.avgcost))
+
+    def test_as_of_end_of_day(self):
+        entries = make_entries([(10, 5), (-4, 6)])
+        entries[1].date += datetime.timedelta(hours=15)
+        fifo = FIFO(entries, history=True)
+        expected = (6, Money(30, "USD"), Money(5, "USD"))
+        self.assertEqual(fifo.as_of(entries[1].date.replace(hour=0)), expected)
+        self.assertEqual(fifo.as_of(entries[1].date.date()), expected)
+        self.assertEqual(fifo.as_of(entries[0].date.date()).stock, 10)
+
+    def test_as_of_after_resume(self):
+        (handle, filename) = tempfile.mkstemp(suffix=".ckpt")
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        entries = make_entries([(10, 5)] + [(0, 5)] * 9 + [(-4, 6)])
+        save_checkpoint(FIFO(entries[:3]), filename)
+        fifo = load_checkpoint(filename, history=True)
+        fifo.add(entries[10])
+        self.assertEqual(fifo.as_of(entries[5].date), (10, Money(50, "USD"), Money(5, "USD")))
+        self.assertEqual(fifo.as_of(entries[10].date), (6, Money(30, "USD"), Money(5, "USD")))
+        with self.assertRaises(ValueError):
+            fifo.as_of(entries[1].date)
+
+    def test_requires_history(self):
+        with self.assertRaises(ValueError):
+            FIFO().as_of(datetime.datetime(2020, 1, 1))
+
+
+class TestStream(unittest.TestCase):
+    """
+    Tests consuming munches as they are produced.
+    """
+
+    def test_stream(self):
+        trades = random_trades(3000, 7)
+        expected = FIFO(make_entries(trades))
+        fifo = FIFO()
+        munches = []
+        for munch in fifo.stream(make_entries(trades)):
+            self.assertEqual(len(fifo.trace), 0)
+            munches.append(munch)
+        self.assertEqual([munch_key(m) for m in munches], [munch_key(m) for m in expected.trace])
+        self.assertEqual(fifo.aggregates, expected.aggregates)
+        self.assertEqual(fifo.stock, expected.stock)
+
+    def test_group_stream_as_tax_rows(self):
+        for numeric in ("money", "minor"):
+            expected = FIFO(make_entries(TRADES), numeric=numeric)
+            rows = FIFO(numeric=numeric).group_stream_as_tax_rows(make_entries(TRADES))
+            self.assertEqual(
+                [(r.tx, r.st, r.qty(), r.cb(), r.proceeds()) for r in rows],
+                [(r.tx, r.st, r.qty(), r.cb(), r.proceeds()) for r in expected.group_as_tax_rows()],
+            )
+
+    def test_print_stream(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            print_stream(FIFO(), make_entries(TRADES))
+        lines = stdout.getvalue()
+        for munch in FIFO(make_entries(TRADES)).trace:
+            self.assertIn(str(munch), lines)
+        self.assertIn(f"Trace Length             :  {len(FIFO(make_entries(TRADES)).trace)}", lines)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            list(FIFO(check=True).stream(make_entries(TRADES)))
+
+
+class TestWashSales(unittest.TestCase):
+    """
+    Tests finding wash sales.
+    """
+
+    def entries(self, trades):
+        start = datetime.datetime(2020, 1, 1)
+        return [
+            Entry(f"t{i}", quantity, Money(price, "USD"), start + datetime.timedelta(days=day))
+            for i, (day, quantity, price) in enumerate(trades)
+        ]
+
+    def test_wash_sales(self):
+        fifo = FIFO(self.entries([(0, 100, 10), (5, 30, 9), (10, -100, 8), (20, 60, 9), (60, 100, 9), (70, -50, 12)]))
+        wash_sales = find_wash_sales(fifo)
+        self.assertEqual(
+            [(w.munch[1].tx, w.quantity, w.disallowed, w.replacement_tx) for w in wash_sales],
+            [("t2", 30, Money(60, "USD"), "t1"), ("t2", 60, Money(120, "USD"), "t3")],
+        )
+        self.assertEqual(basis_adjustments(wash_sales), {"t1": Money(60, "USD"), "t3": Money(120, "USD")})
+
+    def test_outside_window(self):
+        fifo = FIFO(self.entries([(0, 100, 10), (40, -100, 8), (71, 100, 9)]))
+        self.assertEqual(find_wash_sales(fifo), [])
+
+    def test_replacement_used_once(self):
+        fifo = FIFO(self.entries([(0, 10, 10), (1, 10, 10), (40, -10, 8), (41, -10, 8), (42, 5, 7)]))
+        wash_sales = find_wash_sales(fifo)
+        self.assertEqual([(w.munch[1].tx, w.quantity, w.replacement_tx) for w in wash_sales], [("t2", 5, "t4")])
+
+    def test_lots_of_the_same_sale(self):
+        fifo = FIFO(self.entries([(0, 100, 10), (3, 100, 10), (5, -200, 8)]))
+        self.assertEqual(fifo.stock, 0)
+        self.assertEqual(find_wash_sales(fifo), [])
+
+    def test_replacement_held_after_sale(self):
+        fifo = FIFO(self.entries([(0, 50, 10), (2, 20, 10), (4, -50, 12), (6, -20, 12), (8, 10, 9), (9, -10, 8)]))
+        self.assertEqual(find_wash_sales(fifo), [])
+        fifo = FIFO(self.entries([(0, 50, 10), (2, 20, 10), (4, 30, 9), (6, -50, 8)]))
+        wash_sales = find_wash_sales(fifo)
+        self.assertEqual([(w.quantity, w.replacement_tx) for w in wash_sales], [(20, "t1"), (30, "t2")])
+        self.assertEqual(basis_adjustments(wash_sales), {"t1": Money(40, "USD"), "t2": Money(60, "USD")})
+
+
+@unittest.skipIf(pyarrow is None, "PyArrow is not installed")
+class TestArrowIO(unittest.TestCase):
+    """
+    Tests reading and writing Arrow and Parquet files.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        entries = make_entries(TRADES)
+        self.table = pyarrow.table({
+            "Tx": [e.tx for e in entries],
+            "Qty": [e.quantity for e in entries],
+            "Cost": pyarrow.array([e.price.amount for e in entries], pyarrow.decimal128(10, 2)),
+            "Date": [e.date for e in entries],
+            "Symbol": ["AB"[i % 2] for i in range(len(entries))],
+        })
+
+    def test_read_parquet(self):
+        filename = os.path.join(self.directory, "entries.parquet")
+        pyarrow.parquet.write_table(self.table, filename)
+        fifo = arrow_io.read_parquet(filename)
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in FIFO(make_entries(TRADES)).trace])
+        entries = list(arrow_io.iter_parquet(filename, columns=("Symbol",)))
+        self.assertEqual([e.data["Symbol"] for e in entries[:3]], ["A", "B", "A"])
+
+    def test_read_arrow(self):
+        filename = os.path.join(self.directory, "entries.arrow")
+        with pyarrow.ipc.new_file(filename, self.table.schema) as writer:
+            writer.write_table(self.table, max_chunksize=7)
+        stats = Stats()
+        fifo = arrow_io.read_arrow(filename, stats=stats)
+        self.assertEqual(fifo.aggregates, FIFO(make_entries(TRADES)).aggregates)
+        self.assertEqual(stats.entries, len(TRADES))
+
+    def test_write_trace(self):
+        fifo = FIFO(make_entries(TRADES))
+        for format in ("parquet", "arrow"):
+            filename = os.path.join(self.directory, f"trace.{format}")
+            self.assertEqual(arrow_io.write_trace(fifo.trace, filename, format), len(fifo.trace))
+            if format == "parquet":
+                table = pyarrow.parquet.read_table(filename)
+            else:
+                table = pyarrow.ipc.open_file(filename).read_all()
+            self.assertEqual(table.schema.metadata[b"currency"], b"USD")
+            self.assertEqual(table.column("in_tx").to_pylist(), [m[0].tx for m in fifo.trace])
+            self.assertEqual(table.column("out_price").to_pylist(), [m[1].price.amount for m in fifo.trace])
+
+    def test_write_tax_rows(self):
+        fifo = FIFO(make_entries(TRADES))
+        filename = os.path.join(self.directory, "tax_rows.parquet")
+        rows = list(fifo.group_as_tax_rows())
+        self.assertEqual(arrow_io.write_tax_rows(rows, filename), len(rows))
+        table = pyarrow.parquet.read_table(filename)
+        self.assertEqual(table.column("cb").to_pylist(), [r.cb().amount for r in rows])
+
+
+class TestIngest(unittest.TestCase):
+    """
+    Tests feeding entries from asynchronous producers.
+    """
+
+    def test_producers(self):
+        entries = make_entries(random_trades(500, 8))
+        order = []
+
+        async def ingest():
+            updates = []
+            async with Ingest(maxsize=8, updates=True) as ingest:
+                async def produce(part):
+                    for entry in part:
+                        order.append(int(entry.tx[1:]))
+                        await ingest.put(entry)
+                        self.assertLessEqual(ingest._entries.qsize(), 8)
+                        await asyncio.sleep(0)
+
+                async def report():
+                    async for update in ingest.updates():
+                        updates.append(update)
+
+                reporter = asyncio.create_task(report())
+                await asyncio.gather(produce(entries[:250]), produce(entries[250:]))
+            await reporter
+            return ingest.fifo, updates
+
+        fifo, updates = asyncio.run(ingest())
+        self.assertEqual(sum(u.entries for u in updates), len(entries))
+        self.assertEqual(sum(len(u.munches) for u in updates), len(fifo.trace))
+        self.assertEqual((updates[-1].stock, updates[-1].valuation), (fifo.stock, fifo.valuation))
+        # Entries are applied in the order they were put:
+        fresh = make_entries(random_trades(500, 8))
+        expected = FIFO([fresh[i] for i in order])
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in expected.trace])
+
+    def test_order(self):
+        async def ingest():
+            async with Ingest(check=True) as ingest:
+                for entry in make_entries(TRADES):
+                    await ingest.put(entry)
+            return ingest.fifo
+
+        fifo = asyncio.run(ingest())
+        self.assertEqual([munch_key(m) for m in fifo.trace], [munch_key(m) for m in FIFO(make_entries(TRADES)).trace])
+
+    def test_failure(self):
+        async def ingest():
+            async with Ingest(maxsize=2) as ingest:
+                await ingest.put(make_entries([(1, 1)])[0])
+                await ingest.put("not an entry")
+                for entry in make_entries(TRADES):
+                    await ingest.put(entry)
+
+        with self.assertRaises((RuntimeError, AttributeError)):
+            asyncio.run(ingest())
+
+    def test_cancelled_with_updates_pending(self):
+        entries = make_entries(random_trades(500, 8))
+
+        async def ingest():
+            # Leaving the block used to wait for room for the end of the
+            # updates until cancelled:
+            async with Ingest(maxsize=2, updates=True) as ingest:
+                async def produce():
+                    for entry in itertools.cycle(entries):
+                        await ingest.put(entry)
+
+                async def report():
+                    async for _ in ingest.updates():
+                        await asyncio.sleep(0.05)
+
+                async def fail():
+                    await asyncio.sleep(0.2)
+                    raise KeyError("failed")
+
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(produce())
+                    group.create_task(report())
+                    group.create_task(fail())
+
+        async def run():
+            started = time.monotonic()
+            with self.assertRaises(ExceptionGroup) as raised:
+                await asyncio.wait_for(ingest(), 5)
+            self.assertTrue(raised.exception.subgroup(KeyError))
+            self.assertLess(time.monotonic() - started, 4)
+
+        asyncio.run(run())
+
+
+class TestWriter(unittest.TestCase):
+    """
+    Tests the bulk plain and record writers.
+    """
+
+    def test_format_money(self):
+        for amount in ("0", "12.5", "-1234.567", "1000000"):
+            money = Money(amount, "USD")
+            for locale in ("en_US", "de_DE"):
+                for currency_digits in (True, False):
+                    self.assertEqual(
+                        format_money(money, locale=locale, currency_digits=currency_digits),
+                        moneyed.format_money(money, locale=locale, currency_digits=currency_digits),
+                    )
+            self.assertEqual(format_money(money), moneyed.format_money(money))
+
+    def test_write_plain(self):
+        fifo = FIFO(make_entries(TRADES))
+        file = io.StringIO()
+        write_plain(fifo, file)
+        expected = io.StringIO()
+        with contextlib.redirect_stdout(expected):
+            print("Available Stock          : ", fifo.stock)
+            print("Stock Valuation          : ", fifo.valuation)
+            print("Factored Average Cost    : ", fifo.avgcost)
+            print("Factored Stock Valuation : ", fifo.valuation_factored)
+            print("Average Cost             : ", fifo.avgcost_factored)
+            print("Trace Length             : ", len(fifo.trace))
+            print("Total Runtime            : ", fifo.runtime)
+            for element in fifo.trace:
+                print(element)
+            for tax_row in fifo.group_as_tax_rows():
+                print(tax_row)
+        self.assertEqual(file.getvalue(), expected.getvalue())
+
+    def test_cli_records_on_stdout_only(self):
+        filename = write_csv(TRADES)
+        self.addCleanup(os.remove, filename)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-f", filename, "--format", "csv", "--jobs", "2", "--profile"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        rows = list(csv.reader(io.StringIO(result.stdout)))
+        self.assertEqual(len(rows), len(FIFO(make_entries(TRADES)).trace) + 1)
+        self.assertIn("Profile", result.stderr)
+        self.assertEqual(runner.invoke(cli, ["-f", filename, "--format", "cvs"]).exit_code, 2)
+
+    def test_cli_stream_records(self):
+        filename = write_csv(TRADES)
+        self.addCleanup(os.remove, filename)
+        result = CliRunner().invoke(cli, ["-f", filename, "--stream", "--format", "csv"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        rows = list(csv.reader(io.StringIO(result.stdout)))
+        self.assertEqual(len(rows), len(FIFO(make_entries(TRADES)).trace) + 1)
+        self.assertEqual(rows.count(rows[0]), 1)
+
+    def test_write_records(self):
+        fifo = FIFO(make_entries(TRADES))
+        for format in ("csv", "tsv"):
+            file = io.StringIO()
+            with RecordWriter(file, format, ("Symbol",)) as writer:
+                writer.write(fifo.trace, ("A",))
+            rows = list(csv.DictReader(io.StringIO(file.getvalue()), delimiter="\t" if format == "tsv" else ","))
+            self.assertEqual(len(rows), len(fifo.trace))
+            self.assertEqual(
+                (rows[0]["Symbol"], rows[0]["in_tx"], rows[0]["out_qty"], rows[0]["in_date"]),
+                ("A", fifo.trace[0][0].tx, str(fifo.trace[0][1].quantity), fifo.trace[0][0].date.isoformat()),
+            )
+        file = io.StringIO()
+        with RecordWriter(file, "jsonl") as writer:
+            writer.write(fifo.trace)
+        records = [json.loads(line) for line in file.getvalue().splitlines()]
+        self.assertEqual(sum(Money(r["cb"], r["currency"]) for r in records), sum(m.cb() for m in fifo.trace))
+        self.assertEqual(records[0]["in_qty"], fifo.trace[0][0].quantity)
+        file = io.StringIO()
+        with RecordWriter(file, "jsonl") as writer:
+            day = datetime.datetime(2020, 1, 1)
+            entries = [Entry("a", Decimal("1.5"), Money(10, "USD"), day), Entry("b", Decimal("-0.5"), Money(12, "USD"), day)]
+            writer.write(FIFO(entries).trace)
+        record = json.loads(file.getvalue())
+        self.assertEqual((record["in_qty"], record["out_qty"]), ("0.5", "-0.5"))
+        with self.assertRaises(ValueError):
+            RecordWriter(io.StringIO(), "xml")
+
+
 if __name__ == "__main__":
     # Test the above:
     unittest.main()